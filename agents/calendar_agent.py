@@ -1,6 +1,8 @@
 # agents/calendar_agent.py
 from datetime import datetime, timedelta
-from services.calendar_service import find_available_slots, get_upcoming_events, create_event
+from dateutil.tz import gettz
+from config import CALENDAR_TIMEZONE, SLOT_RANKING, SLOTS_TO_OFFER
+from services.calendar_service import find_available_slots, find_slots_in_windows, get_upcoming_events, create_event
 from utils.time_utils import parse_relative_date, parse_time_constraint  # Ensure imports
 
 class CalendarAgent:
@@ -31,26 +33,33 @@ class CalendarAgent:
             preferred_time_range=preferred_time_range
         )
     
+    def get_events_on_date(self, date_obj):
+        """Return pre-parsed events overlapping a given date"""
+        today = datetime.now(gettz(CALENDAR_TIMEZONE)).date()
+        days_ahead = max(7, (date_obj - today).days + 1)
+        return get_upcoming_events(days_ahead).on_date(date_obj)
+    
     def handle_no_slots(self, original_date):
         """Generate alternative suggestions when no slots are available"""
-        alternatives = []
-        
-        # Try next day
         next_day = original_date + timedelta(days=1)
-        next_day_slots = find_available_slots(60, preferred_date=next_day)
+        time_ranges = ["morning", "afternoon", "evening"]
+        
+        # Next day plus the same day's time ranges, answered in one pass (best two slots each)
+        queries = [(next_day, None)] + [(original_date, time_range) for time_range in time_ranges]
+        next_day_slots, *range_slots = find_slots_in_windows(60, queries, limit=SLOTS_TO_OFFER, score=SLOT_RANKING)
+        
+        alternatives = []
         if next_day_slots:
             alternatives.append({
                 "date": next_day,
-                "slots": next_day_slots[:2]  # First two slots
+                "slots": next_day_slots
             })
         
-        # Try same day different time range
-        for time_range in ["morning", "afternoon", "evening"]:
-            range_slots = find_available_slots(60, preferred_date=original_date, preferred_time_range=time_range)
-            if range_slots:
+        for time_range, slots in zip(time_ranges, range_slots):
+            if slots:
                 alternatives.append({
                     "time_range": time_range,
-                    "slots": range_slots[:2]
+                    "slots": slots
                 })
         
         return alternatives
@@ -1,5 +1,6 @@
 # agents/conversation_agent.py
 from services.llm_service import LLMService
+from services.nlu import SpeculativeNLU
 from agents.calendar_agent import CalendarAgent
 from utils.time_utils import parse_relative_date
 import re
@@ -17,21 +18,24 @@ RESPONSE_TEMPLATES = {
 class ConversationAgent:
     def __init__(self):
         self.llm_service = LLMService()
+        self.nlu = SpeculativeNLU(self.llm_service)
         self.calendar_agent = CalendarAgent()
         self.context = {}
     
     def handle_user_request(self, user_input):
-        # Step 1: Quick intent detection
+        # Step 1: Start LLM extraction in the background, then try the quick paths
+        speculation = self.nlu.speculate(user_input)
         intent = self.detect_simple_intent(user_input)
         if intent:
+            speculation.cancel()
             return RESPONSE_TEMPLATES[intent], [], []
         
-        # Step 2: LLM parameter extraction
-        params = self.llm_service.extract_parameters(user_input)
+        # Step 2: Rule-based extraction; waits for (and merges with) the LLM only if the rules are unsure
+        params = speculation.resolve()
         
         # Step 3: Handle query intent
         if params.get("intent") == "query":
-            date_str = params.get("date", user_input)
+            date_str = params.get("date") or user_input
             return self.handle_date_query(date_str)
         
         # ... rest of scheduling logic ...
@@ -57,7 +61,7 @@ class ConversationAgent:
             if not events:
                 return RESPONSE_TEMPLATES["no_events"].format(date=date_str), [], []
             
-            event_list = ", ".join([e['summary'] for e in events[:3]])
+            event_list = ", ".join([e.summary for e in events[:3]])
             if len(events) > 3:
                 event_list += f" and {len(events)-3} more"
                 
@@ -0,0 +1,189 @@
+# benchmarks/bench_calendar.py
+"""Slot search, alternative generation and event creation benchmarks
+
+Runs against gcal.fake_calendar with synthetic calendars, so no OAuth or
+network is needed. From the project root:
+
+    python -m benchmarks.bench_calendar            # compare with baselines.json
+    python -m benchmarks.bench_calendar --record   # overwrite the baselines
+
+Exits with status 1 if any case is slower than its baseline by more than
+the tolerance. Each case is timed as the median of --repeat runs with the
+garbage collector paused, under a fixed hash seed and with cache / mirror
+expiry disabled, so results are comparable from run to run.
+"""
+import argparse
+import gc
+import itertools
+import statistics
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from dateutil.tz import gettz
+from config import CALENDAR_TIMEZONE, WORKING_HOURS
+from gcal.auth import set_calendar_backend
+from gcal.fake_calendar import FakeCalendarService
+from services import calendar_service
+from services.calendar_sync import CalendarMirror
+from services.request_scheduler import SCHEDULER
+from agents.calendar_agent import CalendarAgent
+from utils.slot_utils import np
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+SIZES = [100, 1000, 10000, 50000]
+HORIZON_DAYS = 60  # synthetic events are spread over this many days from today
+TOLERANCE = 0.5  # allowed slowdown over baseline (fraction)
+MIN_DELTA = 0.02  # seconds; differences below this are scheduler / CPU frequency noise on shared machines
+HASH_SEED = "0"  # set and dict iteration order affects timings; keep it the same for every run
+
+_created = itertools.count(1)
+
+def build_calendar(num_events, seed=42):
+    """Fake backend seeded with num_events random meetings inside working hours
+
+    A few never-ending recurring meetings (daily standup, weekly syncs) are
+    added on top, as on most real work calendars.
+    """
+    rng = random.Random(seed)
+    tz = gettz(CALENDAR_TIMEZONE)
+    today = datetime.now(tz).replace(hour=0, minute=0, second=0, microsecond=0)
+    day_minutes = (WORKING_HOURS[1] - WORKING_HOURS[0]) * 60
+    fake = FakeCalendarService()
+    for i in range(num_events):
+        day = today + timedelta(days=rng.randrange(HORIZON_DAYS), hours=WORKING_HOURS[0])
+        start = day + timedelta(minutes=rng.randrange(0, day_minutes, 15))
+        end = start + timedelta(minutes=rng.choice([15, 30, 30, 45, 60, 60, 90]))
+        fake.add_event(start, end, summary=f"Meeting {i}")
+    standup = today + timedelta(hours=WORKING_HOURS[0], minutes=30)
+    fake.add_event(standup, standup + timedelta(minutes=15), "Standup", recurrence=["RRULE:FREQ=DAILY;BYDAY=MO,TU,WE,TH,FR"])
+    for day in range(5):
+        sync = today + timedelta(days=day, hours=WORKING_HOURS[0] + 4)
+        fake.add_event(sync, sync + timedelta(minutes=30), f"Weekly sync {day}", recurrence=["RRULE:FREQ=WEEKLY"])
+    return fake
+
+def use_backend(fake):
+    """Point calendar_service at the fake, with a fresh cache and (if enabled) an in-memory mirror"""
+    set_calendar_backend(fake)
+    SCHEDULER.rate = None  # the fake has no quota; pacing would only measure the limiter
+    # A cache entry or mirror sync expiring halfway through would time a refetch instead of the case
+    calendar_service.EVENT_CACHE_TTL = calendar_service.MIRROR_SYNC_INTERVAL = float("inf")
+    # Creates arm a delayed refresh; it could fire mid-case, or after the real backend is back
+    calendar_service._schedule_reconcile = lambda: None
+    calendar_service.EVENT_CACHE.clear()
+    if calendar_service.USE_EVENT_MIRROR:
+        calendar_service.EVENT_MIRROR = CalendarMirror(":memory:")
+
+def measure(func, repeat):
+    """Median wall time of func over repeat runs, after one warm-up run
+
+    The collector is paused while timing: a collection landing inside one
+    run but not another is the largest source of noise on the big cases.
+    """
+    func()
+    timings = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return statistics.median(timings)
+
+def cold_fetch():
+    calendar_service.EVENT_CACHE.clear()
+    calendar_service.get_upcoming_events(30)
+
+def create_one():
+    # Outside the synthetic horizon so created events never change the slot results
+    start = datetime.now(gettz(CALENDAR_TIMEZONE)) + timedelta(days=HORIZON_DAYS + next(_created))
+    calendar_service.create_event("Bench", start.isoformat(), (start + timedelta(minutes=30)).isoformat())
+
+def create_batch(size=50):
+    start = datetime.now(gettz(CALENDAR_TIMEZONE)) + timedelta(days=HORIZON_DAYS + 1000)
+    calendar_service.create_events([
+        {'summary': "Bench", 'start_iso': (start + timedelta(hours=i)).isoformat(),
+         'end_iso': (start + timedelta(hours=i, minutes=30)).isoformat()}
+        for i in range(size)
+    ])
+
+def run(sizes, repeat):
+    tomorrow = datetime.now(gettz(CALENDAR_TIMEZONE)).date() + timedelta(days=1)
+    agent = CalendarAgent()
+    cases = {
+        "fetch_30d_cold": cold_fetch,
+        "slots_7d_sweep": lambda: calendar_service.find_available_slots(60, backend="sweep"),
+        "slots_30d_sweep": lambda: calendar_service.find_available_slots(60, days_ahead=30, backend="sweep"),
+        "slots_90d_sweep": lambda: calendar_service.find_available_slots(60, days_ahead=90, backend="sweep"),
+        "slots_day_time_range": lambda: calendar_service.find_available_slots(
+            30, preferred_date=tomorrow, preferred_time_range="afternoon"),
+        "best_slots_7d": lambda: calendar_service.find_best_slots(60),
+        "alternatives": lambda: agent.handle_no_slots(tomorrow),
+        "create_event": create_one,
+        "create_events_batch50": create_batch,
+    }
+    if np is not None:
+        cases["slots_30d_bitmap"] = lambda: calendar_service.find_available_slots(60, days_ahead=30, backend="bitmap")
+
+    results = {}
+    for size in sizes:
+        use_backend(build_calendar(size))
+        results[str(size)] = {name: round(measure(func, repeat), 6) for name, func in cases.items()}
+        print(f"{size} events")
+        for name, seconds in results[str(size)].items():
+            print(f"  {name:<24}{seconds * 1000:10.2f} ms")
+    set_calendar_backend(None)
+    return results
+
+def compare(results, baselines, tolerance):
+    """Print regressions against the recorded baselines; returns True if there are none"""
+    ok = True
+    for size, cases in results.items():
+        for name, seconds in cases.items():
+            baseline = baselines.get(size, {}).get(name)
+            if baseline is None:
+                continue
+            if seconds > baseline * (1 + tolerance) and seconds - baseline > MIN_DELTA:
+                print(f"REGRESSION {size} events / {name}: {seconds * 1000:.2f} ms (baseline {baseline * 1000:.2f} ms)")
+                ok = False
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--record", action="store_true", help="write results to baselines.json")
+    args = parser.parse_args()
+
+    if os.environ.get("PYTHONHASHSEED") != HASH_SEED:
+        # The hash seed is fixed at interpreter start; restart with the pinned one
+        os.environ["PYTHONHASHSEED"] = HASH_SEED
+        os.execv(sys.executable, [sys.executable, "-m", "benchmarks.bench_calendar"] + sys.argv[1:])
+
+    results = run(args.sizes, args.repeat)
+
+    if args.record:
+        with open(BASELINES_PATH, "w") as f:
+            json.dump({"machine": platform.platform(), "python": platform.python_version(),
+                       "results": results}, f, indent=2)
+        print(f"Baselines written to {BASELINES_PATH}")
+        return
+
+    if not os.path.exists(BASELINES_PATH):
+        print("No baselines recorded yet; run with --record")
+        return
+    with open(BASELINES_PATH) as f:
+        baselines = json.load(f)["results"]
+    if not compare(results, baselines, args.tolerance):
+        sys.exit(1)
+    print("No regressions")
+
+if __name__ == "__main__":
+    main()
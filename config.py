@@ -9,9 +9,36 @@ CALENDAR_TIMEZONE = 'Asia/Kolkata'
 WORKING_HOURS = (9, 18)  # 9AM to 6PM
 DEFAULT_DURATION = 30  # minutes
 SLOT_INTERVAL = 15  # minutes
+SLOT_BACKEND = "sweep"  # "sweep", "bitmap" (NumPy) or "auto"; the bitmap benchmarks no faster than the sweep, even at 30-90 days
+BITMAP_MIN_DAYS = 14  # horizon at which "auto" switches to the bitmap backend
+SLOT_RANKING = "earliest"  # order of the slots read out: "earliest", "fragmentation" or "buffer" (see utils/slot_utils.py)
+SLOTS_TO_OFFER = 2  # slots offered per answer
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 GCAL_CREDS_PATH = os.path.join(BASE_DIR, "gcal", "credentials.json")
 GCAL_TOKEN_PATH = os.path.join(BASE_DIR, "gcal", "token.json")
+TOKEN_REFRESH_MARGIN = 300  # refresh OAuth tokens in the background this many seconds before expiry
+USE_EVENT_MIRROR = True  # Serve events from a local SQLite mirror synced with syncTokens
+EVENT_MIRROR_PATH = os.path.join(BASE_DIR, "gcal", "events.db")
+MIRROR_SYNC_INTERVAL = 30  # seconds between incremental syncs
+EXPAND_RECURRENCE = True  # mirror syncs recurring masters and expands RRULEs locally instead of every instance
+EVENTS_PAGE_SIZE = 2500  # maxResults per events.list page (API maximum)
+EVENT_CACHE_TTL = 30  # seconds a fetched time range stays valid
+EVENT_CACHE_MAX_EVENTS = 20000  # evict oldest ranges beyond this many cached events
+RECONCILE_DELAY = 5  # seconds after a write before a background refresh reconciles the cache
+WATCH_ADDRESS = None  # public HTTPS URL forwarded to the local receiver; set it to enable push notifications
+WATCH_HOST = "127.0.0.1"  # local notification receiver
+WATCH_PORT = 8765
+WATCH_CHANNEL_TTL = 86400  # seconds requested for each watch channel
+WATCH_RENEW_MARGIN = 600  # renew channels this many seconds before they expire
+PUSH_CACHE_TTL = 3600  # cache / mirror max age while push notifications are active
+CALENDAR_BATCH_SIZE = 50  # requests per Calendar batch call (API limit is 50)
+FREEBUSY_CHUNK_SIZE = 50  # calendars per freeBusy query (API limit is 50)
+FREEBUSY_MAX_WORKERS = 8  # concurrent freeBusy queries
+API_RATE_LIMIT = 10  # Calendar requests per second per credential (token bucket refill rate)
+API_BURST = 50  # requests a credential may send at once before being paced (one full batch)
+API_MAX_RETRIES = 5  # retries for rate-limited (403/429) and 5xx responses
+API_BACKOFF_BASE = 0.5  # seconds; exponential backoff doubles this per retry (full jitter)
+API_BACKOFF_MAX = 32  # cap on a single backoff delay, in seconds
 
 # Voice configuration
 VOICE_SAMPLE_RATE = 16000
@@ -20,10 +47,31 @@ VOICE_SUBTYPE = "PCM_16"
 
 # Vosk configuration
 VOSK_MODEL_NAME = "vosk-model-en-us-0.22"  # Model name for auto-download
+VOSK_RECOGNIZER_POOL = 2  # idle recognizers kept for reuse (each holds its own decoder state)
+VOSK_CHUNK_BYTES = 8000  # audio fed to the recognizer per call (0.25 s of 16 kHz int16)
 
 # LLM configuration (Ollama)
 LLM_URL = "http://localhost:11434/api/generate"
 LLM_MODEL = "llama3"  # powerful model
+LLM_FAST_MODEL = "gemma:2b"  # small model for short conversational replies
+LLM_KEEP_ALIVE = "30m"  # how long Ollama keeps a model loaded after a request (-1 = always resident)
+LLM_WARMUP = True  # load the models in the background at startup
+LLM_POOL_SIZE = 4  # pooled keep-alive connections to Ollama
+LLM_COLD_LOAD_THRESHOLD = 0.5  # seconds of load_duration that count as a cold model load
+LLM_STREAM_MIN_CLAUSE = 40  # characters before a clause break (,;:) is spoken on its own when streaming
+LLM_STATE_TOKEN_BUDGET = 200  # approximate tokens of conversation state sent with each reply prompt
+LLM_MAX_CONCURRENCY = 2  # LLM calls sent to Ollama at once (match OLLAMA_NUM_PARALLEL); the rest queue
+LLM_DISPATCH_HISTORY = 500  # recent calls kept for queue wait / inference stats
+LLM_LATENCY_BUDGETS = {"extract": 2.0, "respond": 1.0}  # seconds per call type; the router picks a model that fits
+ROUTER_WINDOW = 20  # recent calls per model behind the router's latency / validity stats
+ROUTER_MIN_VALIDITY = 0.8  # skip models whose recent output parsed less often than this
+ROUTER_PROBE_INTERVAL = 60  # seconds before a model the router keeps skipping is tried again
+ROUTER_LOG_SIZE = 200  # routing decisions kept for report()
+NLU_CACHE_SIZE = 512  # extraction results kept for repeated utterances (LRU)
+NLU_CACHE_TTL = 6 * 3600  # seconds an extraction result stays valid
+NLU_CACHE_PATH = None  # e.g. os.path.join(BASE_DIR, "nlu_cache.json") to keep the cache across restarts
+NLU_CONFIDENCE_THRESHOLD = 0.8  # rule-based extraction at or above this skips (cancels) the LLM
+NLU_MAX_WORKERS = 4  # concurrent speculative LLM extractions
 LLM_TEMPERATURE = 0.1  # For structured responses
 LLM_CONVERSATION_TEMP = 0.7  # For conversational responses
 
@@ -1,24 +1,108 @@
 # gcal/auth.py
 import os
+import json
+import threading
+from datetime import datetime
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 from google_auth_oauthlib.flow import InstalledAppFlow
-from config import SCOPES, GCAL_CREDS_PATH, GCAL_TOKEN_PATH
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from config import SCOPES, GCAL_CREDS_PATH, GCAL_TOKEN_PATH, TOKEN_REFRESH_MARGIN
 
 def get_google_credentials():
-    """Authenticate and return Google credentials"""
-    creds = None
-    if os.path.exists(GCAL_TOKEN_PATH):
+    """Authenticate and return Google credentials (kept in memory after the first call)"""
+    return CLIENT_MANAGER.get_credentials()
+
+def get_calendar_service():
+    """Return the shared Google Calendar service for the calling thread"""
+    return CLIENT_MANAGER.get_service()
+
+def set_calendar_backend(backend):
+    """Serve get_calendar_service() from another backend (e.g. gcal.fake_calendar); None restores Google"""
+    CLIENT_MANAGER.backend = backend
+
+def _load_credentials(creds=None):
+    """Load credentials from token.json, refreshing or running the OAuth flow if needed"""
+    if creds is None and os.path.exists(GCAL_TOKEN_PATH):
         creds = Credentials.from_authorized_user_file(GCAL_TOKEN_PATH, SCOPES)
-    
+
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
             creds.refresh(Request())
         else:
             flow = InstalledAppFlow.from_client_secrets_file(GCAL_CREDS_PATH, SCOPES)
             creds = flow.run_local_server(port=0)
-        
-        with open(GCAL_TOKEN_PATH, 'w') as token:
-            token.write(creds.to_json())
-    
-    return creds
\ No newline at end of file
+
+        _save_credentials(creds)
+
+    return creds
+
+def _save_credentials(creds):
+    with open(GCAL_TOKEN_PATH, 'w') as token:
+        token.write(creds.to_json())
+
+class CalendarClientManager:
+    """Process-wide Calendar client shared by the auth and calendar service modules
+
+    Credentials are loaded from disk once and kept in memory, and refreshed in
+    the background shortly before they expire. The discovery document is read
+    once from the static copy bundled with google-api-python-client; each
+    thread gets its own service because httplib2 is not thread-safe.
+    """
+    def __init__(self, refresh_margin=TOKEN_REFRESH_MARGIN):
+        self.refresh_margin = refresh_margin
+        self._creds = None
+        self._discovery_doc = None
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._refresh_timer = None
+        self.backend = None  # replaces the Google service when set (no OAuth, no network)
+
+    def get_credentials(self):
+        with self._lock:
+            if self._creds is None or not self._creds.valid:
+                self._creds = _load_credentials(self._creds)
+                self._schedule_refresh()
+            return self._creds
+
+    def get_service(self):
+        if self.backend is not None:
+            return self.backend
+        creds = self.get_credentials()
+        # Rebuild only if the credentials object was replaced (e.g. a new OAuth login)
+        if getattr(self._local, "creds", None) is not creds:
+            self._local.service = build_from_document(self._get_discovery_doc(), credentials=creds)
+            self._local.creds = creds
+        return self._local.service
+
+    def _get_discovery_doc(self):
+        with self._lock:
+            if self._discovery_doc is None:
+                self._discovery_doc = json.loads(get_static_doc('calendar', 'v3'))
+            return self._discovery_doc
+
+    def _schedule_refresh(self):
+        """Arm a timer that refreshes the token refresh_margin seconds before expiry"""
+        if self._refresh_timer:
+            self._refresh_timer.cancel()
+        if not self._creds.expiry or not self._creds.refresh_token:
+            return
+        # google-auth keeps expiry as a naive UTC datetime
+        delay = (self._creds.expiry - datetime.utcnow()).total_seconds() - self.refresh_margin
+        self._refresh_timer = threading.Timer(max(delay, 0), self._refresh)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+    def _refresh(self):
+        with self._lock:
+            try:
+                self._creds.refresh(Request())
+                _save_credentials(self._creds)
+            except Exception as e:
+                # get_credentials() retries on the next call if the token is still invalid
+                print(f"Token refresh failed: {str(e)}")
+                return
+            self._schedule_refresh()
+
+CLIENT_MANAGER = CalendarClientManager()
@@ -0,0 +1,341 @@
+# gcal/fake_calendar.py
+import threading
+import time
+import urllib.request
+import uuid
+from datetime import datetime, timezone
+import httplib2
+from dateutil.tz import gettz
+from googleapiclient.errors import HttpError
+from config import CALENDAR_TIMEZONE
+from services.event_store import to_epoch
+from services.recurrence import RecurringSeries
+
+EXPANSION_DAYS = 365  # how far ahead singleEvents=True expands series that never end
+
+def _http_error(status, message):
+    return HttpError(httplib2.Response({"status": status}), message.encode())
+
+def _rfc3339(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat().replace('+00:00', 'Z')
+
+class FakeRequest:
+    """Deferred call with the same execute() shape as googleapiclient requests"""
+    def __init__(self, service, func, *args):
+        self.service = service
+        self.func = func
+        self.args = args
+
+    def execute(self, num_retries=0):
+        self.service.requests += 1
+        if self.service.latency:
+            time.sleep(self.service.latency)
+        self.service._raise_injected()
+        return self.func(*self.args)
+
+class FakeBatch:
+    """Stand-in for BatchHttpRequest: one simulated round trip for all added requests"""
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self.requests.append((request_id or str(len(self.requests)), request, callback or self.callback))
+
+    def execute(self):
+        self.service.requests += 1
+        if self.service.latency:
+            time.sleep(self.service.latency)
+        for request_id, request, callback in self.requests:
+            try:
+                self.service._raise_injected()
+                response, exception = request.func(*request.args), None
+            except HttpError as e:
+                response, exception = None, e
+            callback(request_id, response, exception)
+
+class FakeEvents:
+    def __init__(self, service):
+        self.service = service
+
+    def list(self, calendarId, **params):
+        return FakeRequest(self.service, self.service._list, calendarId, params)
+
+    def insert(self, calendarId, body, **params):
+        return FakeRequest(self.service, self.service._insert, calendarId, body)
+
+    def watch(self, calendarId, body, **params):
+        return FakeRequest(self.service, self.service._watch, calendarId, body)
+
+class FakeChannels:
+    def __init__(self, service):
+        self.service = service
+
+    def stop(self, body):
+        return FakeRequest(self.service, self.service._stop_channel, body)
+
+class FakeFreeBusy:
+    def __init__(self, service):
+        self.service = service
+
+    def query(self, body):
+        return FakeRequest(self.service, self.service._freebusy, body)
+
+class FakeCalendarService:
+    """In-memory Google Calendar backend for tests and benchmarks
+
+    Implements the subset of the Calendar v3 client used by this project:
+    events().list (time ranges, pagination, sync tokens, cancelled
+    tombstones, recurring masters with singleEvents expansion),
+    events().insert, events().watch / channels().stop (web_hook channels
+    get real HTTP POSTs, like Google's push notifications), freebusy().query
+    and batch requests. latency adds a simulated round-trip delay (seconds)
+    to every request; inject_errors() makes upcoming requests fail, e.g. with
+    quota errors.
+    """
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = 0
+        self.version = 0
+        self.calendars = {}  # calendar id -> {event id: (version, start, end, resource)}
+        self.watch_channels = {}  # channel id -> [calendar id, channel resource, webhook token, messages sent]
+        self.lock = threading.Lock()
+        self.injected_errors = 0
+        self.injected_error = None
+
+    def events(self):
+        return FakeEvents(self)
+
+    def freebusy(self):
+        return FakeFreeBusy(self)
+
+    def channels(self):
+        return FakeChannels(self)
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
+
+    def inject_errors(self, count, status=403, reason='rateLimitExceeded'):
+        """Fail the next count requests (batch items count one each) like a throttled Google"""
+        content = f'{{"error": {{"code": {status}, "errors": [{{"reason": "{reason}"}}]}}}}'
+        self.injected_error = (status, content)
+        self.injected_errors = count
+
+    def _raise_injected(self):
+        with self.lock:
+            if not self.injected_errors:
+                return
+            self.injected_errors -= 1
+        raise _http_error(*self.injected_error)
+
+    def add_event(self, start, end, summary="Busy", calendar_id='primary', event_id=None, recurrence=None):
+        """Seed an event directly (start/end as aware datetimes); returns the resource
+
+        recurrence is a list of RRULE/EXDATE/RDATE lines, making this a recurring master.
+        """
+        tz_name = CALENDAR_TIMEZONE
+        body = {
+            'summary': summary,
+            'start': {'dateTime': start.isoformat(), 'timeZone': tz_name},
+            'end': {'dateTime': end.isoformat(), 'timeZone': tz_name},
+        }
+        if recurrence:
+            body['recurrence'] = list(recurrence)
+        return self._insert(calendar_id, body, event_id)
+
+    def add_exception(self, master_id, original_start, start=None, end=None, calendar_id='primary'):
+        """Move one instance of a recurring event (or cancel it when start is None)"""
+        tz = gettz(CALENDAR_TIMEZONE)
+        with self.lock:
+            master = self.calendars[calendar_id][master_id][3]
+        series = RecurringSeries.from_api(master, tz)
+        instance_id = series.instance_id(original_start.timestamp())
+        if start is None:
+            start, end = original_start, original_start + series.length
+            status = 'cancelled'
+        else:
+            status = 'confirmed'
+        body = {
+            'summary': master.get('summary', ''),
+            'start': {'dateTime': start.isoformat()},
+            'end': {'dateTime': end.isoformat()},
+            'recurringEventId': master_id,
+            'originalStartTime': {'dateTime': original_start.isoformat()},
+        }
+        resource = self._insert(calendar_id, body, instance_id)
+        if status == 'cancelled':
+            self.cancel_event(instance_id, calendar_id)
+        return resource
+
+    def cancel_event(self, event_id, calendar_id='primary'):
+        with self.lock:
+            _, start, end, resource = self.calendars[calendar_id][event_id]
+            self.version += 1
+            resource = dict(resource, status='cancelled')
+            self.calendars[calendar_id][event_id] = (self.version, start, end, resource)
+        self._notify(calendar_id, 'exists')
+
+    def _insert(self, calendar_id, body, event_id=None):
+        tz = gettz(CALENDAR_TIMEZONE)
+        start = body['start'].get('dateTime', body['start'].get('date'))
+        end = body['end'].get('dateTime', body['end'].get('date'))
+        event_id = event_id or uuid.uuid4().hex
+        resource = dict(body, id=event_id, status='confirmed',
+                        htmlLink=f"https://calendar.google.com/event?eid={event_id}")
+        start, end = to_epoch(start, tz), to_epoch(end, tz)
+        if body.get('recurrence'):
+            # Masters span from the first instance to the end of the last one
+            last_end = RecurringSeries.from_api(resource, tz).last_end()
+            end = float('inf') if last_end is None else last_end
+        with self.lock:
+            self.version += 1
+            self.calendars.setdefault(calendar_id, {})[event_id] = (self.version, start, end, resource)
+        self._notify(calendar_id, 'exists')
+        return resource
+
+    def _watch(self, calendar_id, body):
+        ttl = int(body.get('params', {}).get('ttl', 604800))
+        channel = {
+            'kind': 'api#channel',
+            'id': body['id'],
+            'resourceId': uuid.uuid4().hex,
+            'resourceUri': f"https://www.googleapis.com/calendar/v3/calendars/{calendar_id}/events",
+            'expiration': str(int((time.time() + ttl) * 1000)),
+        }
+        with self.lock:
+            self.watch_channels[body['id']] = [calendar_id, dict(channel, address=body['address']), body.get('token'), 0]
+        self._notify(calendar_id, 'sync', body['id'])
+        return channel
+
+    def _stop_channel(self, body):
+        with self.lock:
+            self.watch_channels.pop(body['id'], None)
+
+    def _notify(self, calendar_id, state, channel_id=None):
+        """POST a push notification to every channel watching the calendar (or just channel_id)"""
+        with self.lock:
+            targets = []
+            for watched_id, entry in self.watch_channels.items():
+                if entry[0] == calendar_id and channel_id in (None, watched_id):
+                    entry[3] += 1
+                    targets.append((watched_id, entry[1], entry[2], entry[3]))
+        for watched_id, channel, token, number in targets:
+            headers = {
+                'X-Goog-Channel-ID': watched_id,
+                'X-Goog-Message-Number': str(number),
+                'X-Goog-Resource-ID': channel['resourceId'],
+                'X-Goog-Resource-State': state,
+                'X-Goog-Resource-URI': channel['resourceUri'],
+            }
+            if token:
+                headers['X-Goog-Channel-Token'] = token
+            request = urllib.request.Request(channel['address'], data=b"", headers=headers, method="POST")
+            try:
+                urllib.request.urlopen(request, timeout=5).close()
+            except Exception as e:
+                print(f"Fake notification to {channel['address']} failed: {str(e)}")
+
+    def _instances(self, entries, calendar_events, time_min, time_max):
+        """Replace recurring masters in entries by their instances, like singleEvents=True"""
+        tz = gettz(CALENDAR_TIMEZONE)
+        time_min = max(time_min, 0)
+        time_max = min(time_max, time.time() + EXPANSION_DAYS * 86400)
+        overrides = {}
+        for _, _, _, resource in calendar_events:
+            original = resource.get('originalStartTime')
+            if original:
+                overrides.setdefault(resource['recurringEventId'], set()).add(to_epoch(original['dateTime'], tz))
+
+        expanded = []
+        for version, start, end, resource in entries:
+            if not resource.get('recurrence') or resource['status'] == 'cancelled':
+                expanded.append((version, start, end, resource))
+                continue
+            series = RecurringSeries.from_api(resource, tz)
+            series.overrides = overrides.get(resource['id'], set())
+            fields = {key: value for key, value in resource.items() if key != 'recurrence'}
+            for instance in series.instances(time_min, time_max):
+                if series.all_day:
+                    bounds = {'start': {'date': instance.start_datetime(tz).date().isoformat()},
+                              'end': {'date': instance.end_datetime(tz).date().isoformat()}}
+                else:
+                    bounds = {'start': {'dateTime': instance.start_datetime(tz).isoformat()},
+                              'end': {'dateTime': instance.end_datetime(tz).isoformat()}}
+                expanded.append((version, instance.start, instance.end, dict(
+                    fields, id=instance.id, recurringEventId=resource['id'],
+                    originalStartTime=bounds['start'], **bounds
+                )))
+        return expanded
+
+    def _list(self, calendar_id, params):
+        tz = gettz(CALENDAR_TIMEZONE)
+        sync_token = params.get('syncToken')
+        if sync_token and (params.get('timeMin') or params.get('timeMax')):
+            raise _http_error(400, "syncToken cannot be combined with timeMin/timeMax")
+
+        with self.lock:
+            events = list(self.calendars.get(calendar_id, {}).values())
+            version = self.version
+
+        single_events = params.get('singleEvents', False)
+        if sync_token:
+            if not sync_token.startswith('v') or int(sync_token[1:]) > version:
+                raise _http_error(410, "Sync token is no longer valid")
+            since = int(sync_token[1:])
+            # Incremental sync: everything changed since the token, tombstones included
+            changed = [entry for entry in events if entry[0] > since]
+            if single_events:
+                changed = self._instances(changed, events, float('-inf'), float('inf'))
+            items = [(start, resource) for _, start, end, resource in changed]
+        else:
+            time_min = to_epoch(params['timeMin'], tz) if params.get('timeMin') else float('-inf')
+            time_max = to_epoch(params['timeMax'], tz) if params.get('timeMax') else float('inf')
+            show_deleted = params.get('showDeleted', False)
+            if single_events:
+                events = self._instances(events, events, time_min, time_max)
+            # Like Google, cancelled instances of a series are always listed when singleEvents is off
+            items = [
+                (start, resource) for _, start, end, resource in events
+                if start < time_max and end > time_min
+                and (show_deleted or resource['status'] != 'cancelled'
+                     or (not single_events and resource.get('recurringEventId')))
+            ]
+        items.sort(key=lambda item: item[0])
+
+        # Pagination: the page token is simply the offset of the next page
+        offset = int(params.get('pageToken') or 0)
+        page_size = params.get('maxResults') or 250
+        page = {'items': [resource for _, resource in items[offset:offset + page_size]]}
+        if offset + page_size < len(items):
+            page['nextPageToken'] = str(offset + page_size)
+        else:
+            page['nextSyncToken'] = f"v{version}"
+        return page
+
+    def _freebusy(self, body):
+        tz = gettz(CALENDAR_TIMEZONE)
+        time_min = to_epoch(body['timeMin'], tz)
+        time_max = to_epoch(body['timeMax'], tz)
+        calendars = {}
+        for item in body.get('items', []):
+            with self.lock:
+                events = list(self.calendars.get(item['id'], {}).values())
+            if item['id'] not in self.calendars:
+                calendars[item['id']] = {'busy': [], 'errors': [{'domain': 'global', 'reason': 'notFound'}]}
+                continue
+            events = self._instances(events, events, time_min, time_max)
+            intervals = sorted(
+                (max(start, time_min), min(end, time_max)) for _, start, end, resource in events
+                if start < time_max and end > time_min and resource['status'] != 'cancelled'
+            )
+            # freeBusy returns merged busy periods
+            busy = []
+            for start, end in intervals:
+                if busy and start <= busy[-1][1]:
+                    busy[-1][1] = max(busy[-1][1], end)
+                else:
+                    busy.append([start, end])
+            calendars[item['id']] = {'busy': [{'start': _rfc3339(s), 'end': _rfc3339(e)} for s, e in busy]}
+        return {'kind': 'calendar#freeBusy', 'timeMin': body['timeMin'], 'timeMax': body['timeMax'],
+                'calendars': calendars}
@@ -97,8 +97,15 @@ import re
 import json
 import pyttsx3  # Add this import
 from datetime import datetime, timedelta
-from services.calendar_service import find_available_slots, create_event
-from config import CALENDAR_TIMEZONE  # Import your config
+from services.calendar_service import find_available_slots, find_best_slots, create_event, start_push_notifications
+from config import CALENDAR_TIMEZONE, WATCH_ADDRESS  # Import your config
+from services.llm_service import LLMService
+from services.nlu import SpeculativeNLU
+from utils.speech_utils import speak_pipelined
+from utils.time_utils import parse_relative_date
+
+# Words the PREFERENCE stage understands without help
+PREFERENCE_WORDS = r"\b(today|tomorrow|monday|tuesday|wednesday|thursday|friday|saturday|sunday|morning|afternoon|evening)\b"
 
 class ConversationState:
     """Manage the conversation flow and context"""
@@ -111,6 +118,7 @@ class ConversationState:
         self.preferred_date = None
         self.preferred_time_range = None
         self.available_slots = []
+        self.offered_slots = []
         self.selected_slot = None
         
     def to_dict(self):
@@ -120,6 +128,7 @@ class ConversationState:
             "preferred_date": str(self.preferred_date) if self.preferred_date else None,
             "preferred_time_range": self.preferred_time_range,
             "available_slots": [str(s) for s in self.available_slots],
+            "offered_slots": [str(s) for s in self.offered_slots],
             "selected_slot": str(self.selected_slot) if self.selected_slot else None
         }
 
@@ -130,6 +139,15 @@ class SmartScheduler:
         self.recognizer.pause_threshold = 0.8
         self.state = ConversationState()
         self.engine = pyttsx3.init()  # Initialize TTS engine once
+        self.llm_service = LLMService()
+        self.nlu = SpeculativeNLU(self.llm_service)  # LLM fallback for utterances the patterns miss
+        
+        # Calendar changes are pushed to us when a public webhook address is configured
+        if WATCH_ADDRESS:
+            try:
+                start_push_notifications(WATCH_ADDRESS)
+            except Exception as e:
+                print(f"Push notifications unavailable, polling instead: {e}")
         
     def text_to_speech(self, text):
         """Convert text to speech and print to console"""
@@ -140,6 +158,13 @@ class SmartScheduler:
         except Exception as e:
             print(f"TTS Error: {e}")
     
+    def speak_stream(self, chunks):
+        """Speak a streamed reply (LLMService.stream_conversation_response) piece by piece as it is generated"""
+        first_audio = speak_pipelined(chunks, self.text_to_speech)
+        if first_audio is not None and first_audio > 0.8:
+            print(f"⚠️ First audio after {first_audio:.2f}s")
+        return first_audio
+    
     def listen(self):
         """Capture voice input and convert to text"""
         with sr.Microphone() as source:
@@ -161,24 +186,35 @@ class SmartScheduler:
         # Debug: print current state
         print(f"Current state: {json.dumps(self.state.to_dict(), indent=2)}")
         
+        # LLM extraction starts right away, in parallel with the stage's own patterns
+        if self.state.stage in ("START", "DURATION", "PREFERENCE"):
+            speculation = self.nlu.speculate(text)
+        
         # State machine
         if self.state.stage == "START":
-            if "schedule" in text or "meeting" in text:
+            params = self._nlu_fallback(speculation, "schedule" in text or "meeting" in text)
+            if params is None or params.get("intent") == "schedule":
                 self.state.stage = "DURATION"
                 response = "Okay! How long should the meeting be in minutes?"
         
         elif self.state.stage == "DURATION":
             # Try to extract duration
             duration_match = re.search(r'(\d+)\s*(minute|min|hour|hr|h|m)', text) or re.search(r'(\d+)', text)
+            params = self._nlu_fallback(speculation, duration_match is not None)
+            duration = None
             if duration_match:
                 value = int(duration_match.group(1))
                 unit = duration_match.group(2) if len(duration_match.groups()) > 1 else "minute"
                 
                 if unit in ["hour", "hr", "h"]:
-                    self.state.duration = value * 60
+                    duration = value * 60
                 else:
-                    self.state.duration = value
-                
+                    duration = value
+            elif isinstance(params.get("duration"), int) and params["duration"] > 0:
+                duration = params["duration"]
+            
+            if duration:
+                self.state.duration = duration
                 self.state.stage = "PREFERENCE"
                 response = f"Got it. I'm checking for {self.state.duration}-minute slots. " \
                            "Do you have a preferred day or time?"
@@ -215,20 +251,33 @@ class SmartScheduler:
             elif "evening" in text:
                 self.state.preferred_time_range = "evening"
             
-            # Find available slots
+            # Nothing recognised: use what the NLU (rules, then the LLM) made of it
+            params = self._nlu_fallback(speculation, re.search(PREFERENCE_WORDS, text) is not None)
+            if params:
+                if params.get("date"):
+                    self.state.preferred_date = parse_relative_date(params["date"]) or self.state.preferred_date
+                if params.get("time_range") in ("morning", "afternoon", "evening"):
+                    self.state.preferred_time_range = params["time_range"]
+            
+            # Any free time in the window can be picked; only the best few (ranked by SLOT_RANKING) are read out
             self.state.available_slots = find_available_slots(
                 self.state.duration,
                 preferred_date=self.state.preferred_date,
                 preferred_time_range=self.state.preferred_time_range
             )
+            self.state.offered_slots = find_best_slots(
+                self.state.duration,
+                preferred_date=self.state.preferred_date,
+                preferred_time_range=self.state.preferred_time_range
+            ) if self.state.available_slots else []
             
-            if self.state.available_slots:
+            if self.state.offered_slots:
                 self.state.stage = "OFFER_SLOTS"
-                # Format available slots for response
+                # Format offered slots for response
                 slots_str = ", ".join(
-                    [slot.strftime("%I:%M %p") for slot in self.state.available_slots[:2]]
+                    [slot.strftime("%I:%M %p") for slot in self.state.offered_slots]
                 )
-                day_name = self.state.available_slots[0].strftime("%A") if self.state.preferred_date else "your preferred day"
+                day_name = self.state.offered_slots[0].strftime("%A") if self.state.preferred_date else "your preferred day"
                 response = f"Great. I have {slots_str} available on {day_name}. Which one works for you?"
             else:
                 response = "Sorry, I couldn't find available slots. Would you like to try another day or time?"
@@ -248,18 +297,18 @@ class SmartScheduler:
                 elif period == "am" and hour == 12:
                     hour = 0
                 
-                # Find matching slot
-                for slot in self.state.available_slots:
+                # Find matching slot: one read out, else any other free time in the window
+                for slot in self.state.offered_slots + self.state.available_slots:
                     if slot.hour == hour and slot.minute == minute:
                         self.state.selected_slot = slot
                         break
             
-            # If no time match, try ordinal selection
+            # If no time match, try ordinal selection (of the slots read out)
             if not self.state.selected_slot:
                 if "first" in text or "one" in text or "1" in text:
-                    self.state.selected_slot = self.state.available_slots[0] if self.state.available_slots else None
+                    self.state.selected_slot = self.state.offered_slots[0] if self.state.offered_slots else None
                 elif "second" in text or "two" in text or "2" in text:
-                    self.state.selected_slot = self.state.available_slots[1] if len(self.state.available_slots) > 1 else None
+                    self.state.selected_slot = self.state.offered_slots[1] if len(self.state.offered_slots) > 1 else None
             
             if self.state.selected_slot:
                 self.state.stage = "CONFIRM"
@@ -294,6 +343,13 @@ class SmartScheduler:
         
         return response
 
+    def _nlu_fallback(self, speculation, matched):
+        """None if the stage's own patterns matched (the speculative LLM call is dropped), else the NLU params"""
+        if matched:
+            speculation.cancel()
+            return None
+        return speculation.resolve()
+    
     def next_weekday(self, d, weekday):
         """Get next specific weekday (0=Monday, 6=Sunday)"""
         days_ahead = weekday - d.weekday()
@@ -324,7 +380,13 @@ class SmartScheduler:
                 
                 # Process the command through state machine
                 response = self.parse_command(text)
-                self.text_to_speech(response)
+                if response:
+                    self.text_to_speech(response)
+                else:
+                    # No scripted reply (e.g. small talk before scheduling starts): the LLM answers, spoken as it streams
+                    self.speak_stream(self.llm_service.stream_conversation_response(
+                        dict(self.state.to_dict(), user_said=text)
+                    ))
                 
             except KeyboardInterrupt:
                 break
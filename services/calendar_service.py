@@ -117,90 +117,380 @@
     
 #     return slots
 
-import os
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, time, timedelta
-from dateutil import parser as date_parser
+from itertools import chain
 from dateutil.tz import gettz
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-from config import CALENDAR_TIMEZONE, WORKING_HOURS, SLOT_INTERVAL, SCOPES, GCAL_CREDS_PATH, GCAL_TOKEN_PATH
-
-# Cache for events to prevent multiple API calls
-EVENT_CACHE = {"last_fetched": None, "events": []}
-
-def get_calendar_service():
-    """Authenticate with Google Calendar API"""
-    creds = None
-    if os.path.exists(GCAL_TOKEN_PATH):
-        creds = Credentials.from_authorized_user_file(GCAL_TOKEN_PATH, SCOPES)
-
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(GCAL_CREDS_PATH, SCOPES)
-            creds = flow.run_local_server(port=0)
-        
-        with open(GCAL_TOKEN_PATH, 'w') as token:
-            token.write(creds.to_json())
+from config import CALENDAR_TIMEZONE, WORKING_HOURS, SLOT_INTERVAL, SLOT_BACKEND, BITMAP_MIN_DAYS, SLOT_RANKING, SLOTS_TO_OFFER
+from config import USE_EVENT_MIRROR, MIRROR_SYNC_INTERVAL, CALENDAR_BATCH_SIZE, FREEBUSY_CHUNK_SIZE, FREEBUSY_MAX_WORKERS
+from config import RECONCILE_DELAY, EVENT_CACHE_TTL, WATCH_ADDRESS, PUSH_CACHE_TTL
+from gcal.auth import get_calendar_service  # Shared client: built once, credentials kept in memory
+from services.calendar_sync import CalendarMirror, iter_events
+from services.calendar_watch import CalendarWatcher, NotificationReceiver
+from services.event_cache import RangeEventCache
+from services.event_store import CompactEvent, to_epoch
+from services.request_scheduler import SCHEDULER, credential_of
+from utils.slot_utils import BusyIndex, SLOT_SCORES, bitmap_slot_starts, np, top_slots
+
+# Cache for events to prevent multiple API calls (time-range aware, pre-parsed events)
+EVENT_CACHE = RangeEventCache()
+
+# Persistent local mirror of the primary calendar, opened on first use (see get_event_mirror)
+EVENT_MIRROR = None
+_mirror_lock = threading.Lock()
+
+# Push-notification channel for the primary calendar (see start_push_notifications)
+WATCHER = None
+
+# Long-lived freeBusy workers: each keeps its per-thread calendar service across calls
+# (threads are only started as chunks need them)
+FREEBUSY_POOL = ThreadPoolExecutor(max_workers=FREEBUSY_MAX_WORKERS, thread_name_prefix="freebusy")
 
-    return build('calendar', 'v3', credentials=creds)
+def get_event_mirror():
+    """The local mirror, opening its SQLite file on first use; None when USE_EVENT_MIRROR is off
+
+    Opening lazily keeps imports (and tools such as the benchmark) from
+    creating a file of personal calendar data.
+    """
+    global EVENT_MIRROR
+    if EVENT_MIRROR is None and USE_EVENT_MIRROR:
+        with _mirror_lock:
+            if EVENT_MIRROR is None:
+                EVENT_MIRROR = CalendarMirror()
+    return EVENT_MIRROR
 
 def get_upcoming_events(days_ahead=7, force_refresh=False):
-    """Get events with caching to prevent double-booking"""
-    global EVENT_CACHE
+    """Get events for the next days_ahead days as a pre-parsed EventStore
+
+    Served from a range-aware cache, so only sub-ranges that are not already
+    covered (e.g. the extra days of a longer horizon) are fetched.
+    """
+    time_min, time_max = _horizon(days_ahead)
+    max_age = _max_age()
+    mirror = get_event_mirror()
+
+    if mirror:
+        # Pull only the deltas since the last sync; the cache is stale if anything changed
+        if force_refresh or mirror.is_stale(max_age):
+            if mirror.sync(get_calendar_service()):
+                EVENT_CACHE.clear()
+    elif force_refresh:
+        EVENT_CACHE.clear()
     
-    # Return cached events if recent and not forced to refresh
-    if not force_refresh and EVENT_CACHE["last_fetched"] and \
-       (datetime.now() - EVENT_CACHE["last_fetched"]).seconds < 30:
-        return EVENT_CACHE["events"]
+    return EVENT_CACHE.get(time_min, time_max, _fetch_events)
+
+def _max_age():
+    """How long cached data may be trusted: long while push notifications keep it fresh"""
+    max_age = PUSH_CACHE_TTL if WATCHER is not None and WATCHER.active() else None
+    EVENT_CACHE.ttl = max_age or EVENT_CACHE_TTL
+    return max_age or MIRROR_SYNC_INTERVAL
+
+def start_push_notifications(address=WATCH_ADDRESS, receiver=None):
+    """Watch the primary calendar so changes are pushed instead of polled
+
+    address is the public HTTPS URL Google posts to, forwarded to the local
+    NotificationReceiver. While the channel is open the mirror and cache are
+    trusted for PUSH_CACHE_TTL seconds.
+    """
+    global WATCHER
+    receiver = (receiver or NotificationReceiver()).start()
+    try:
+        WATCHER = CalendarWatcher(receiver, address, _on_calendar_change).start()
+    except Exception:
+        # Without a channel nothing will post to the receiver; give its port and thread back
+        receiver.stop()
+        raise
+    return WATCHER
+
+def stop_push_notifications():
+    global WATCHER
+    if WATCHER:
+        WATCHER.stop()
+        WATCHER.receiver.stop()
+        WATCHER = None
+
+def _on_calendar_change():
+    """Change notification: pull just the delta into the mirror, or drop the cached ranges"""
+    mirror = get_event_mirror()
+    if mirror:
+        if mirror.sync(get_calendar_service()):
+            EVENT_CACHE.clear()
+    else:
+        EVENT_CACHE.clear()
+
+def _horizon(days_ahead):
+    """Epoch-second range for the next days_ahead days, aligned to whole local days
+
+    Alignment makes repeated calls hit the same cached range.
+    """
+    tz = gettz(CALENDAR_TIMEZONE)
+    day_start = datetime.combine(datetime.now(tz).date(), time(0, 0), tzinfo=tz)
+    return day_start.timestamp(), (day_start + timedelta(days=days_ahead + 1)).timestamp()
+
+def _fetch_events(time_min, time_max):
+    """Fetch pre-parsed events overlapping [time_min, time_max) from the mirror or the API"""
+    mirror = get_event_mirror()
+    if mirror:
+        return mirror.store(time_min, time_max).events
     
-    service = get_calendar_service()
     tz = gettz(CALENDAR_TIMEZONE)
-    now = datetime.now(tz).isoformat()
-    later = (datetime.now(tz) + timedelta(days=days_ahead)).isoformat()
-
-    events_result = service.events().list(
-        calendarId='primary',
-        timeMin=now,
-        timeMax=later,
-        singleEvents=True,
-        orderBy='startTime'
-    ).execute()
+    items = iter_events(
+        get_calendar_service(),
+        timeMin=datetime.fromtimestamp(time_min, tz).isoformat(),
+        timeMax=datetime.fromtimestamp(time_max, tz).isoformat(),
+        singleEvents=True
+    )
     
-    events = events_result.get('items', [])
+    # Parse once per fetch, page by page as the cache consumes the stream
+    return (CompactEvent.from_api(item, tz) for item in items)
+
+def create_event(summary, start_iso, end_iso, timezone=CALENDAR_TIMEZONE):
+    """Create new calendar event and write it through to the local cache"""
+    service = get_calendar_service()
+    event = _event_body(summary, start_iso, end_iso, timezone)
+    # Not idempotent: a lost response must not be resent as a second insert
+    created_event = SCHEDULER.execute(service.events().insert(calendarId='primary', body=event), idempotent=False)
     
-    # Update cache
-    EVENT_CACHE = {
-        "last_fetched": datetime.now(),
-        "events": events
-    }
+    # The slot is busy locally right away; no full-list round trip on the booking path
+    write_through([created_event])
     
-    return events
+    return created_event.get('htmlLink')
 
-def create_event(summary, start_iso, end_iso, timezone=CALENDAR_TIMEZONE):
-    """Create new calendar event and refresh cache"""
+def create_events(events, timezone=CALENDAR_TIMEZONE):
+    """Create many events through Calendar batch requests and write them through to the cache
+
+    events is a list of dicts with 'summary', 'start_iso', 'end_iso' and an
+    optional 'timezone'. Returns one result per item, in order:
+    {'link': htmlLink, 'error': None} or {'link': None, 'error': message}.
+    Items that come back rate-limited inside a batch are resent in a later
+    batch after a backoff delay; other failures are final, since the event
+    may have been created anyway.
+    """
     service = get_calendar_service()
-    event = {
+    results = [None] * len(events)
+    created = []
+    retry = []
+    attempt = 0
+    
+    def on_response(request_id, response, exception):
+        if exception and SCHEDULER.should_retry(exception, attempt, idempotent=False):
+            retry.append(int(request_id))
+        elif exception:
+            results[int(request_id)] = {'link': None, 'error': str(exception)}
+        else:
+            results[int(request_id)] = {'link': response.get('htmlLink'), 'error': None}
+            created.append(response)
+    
+    pending = list(range(len(events)))
+    while pending:
+        for offset in range(0, len(pending), CALENDAR_BATCH_SIZE):
+            chunk = pending[offset:offset + CALENDAR_BATCH_SIZE]
+            batch = service.new_batch_http_request(callback=on_response)
+            for index in chunk:
+                item = events[index]
+                body = _event_body(item['summary'], item['start_iso'], item['end_iso'], item.get('timezone', timezone))
+                request = service.events().insert(calendarId='primary', body=body)
+                batch.add(request, request_id=str(index))
+            try:
+                # Each request in a batch counts against the quota separately
+                SCHEDULER.execute(batch, cost=len(chunk), credential=credential_of(request), idempotent=False)
+            except Exception as e:
+                # The whole round trip failed; report it for every item still without a result
+                for index in chunk:
+                    if results[index] is None and index not in retry:
+                        results[index] = {'link': None, 'error': str(e)}
+        
+        pending, retry = sorted(retry), []
+        if pending:
+            SCHEDULER.pause(attempt)
+            attempt += 1
+    
+    if created:
+        write_through(created)
+    
+    return results
+
+def write_through(resources):
+    """Apply freshly created event resources to the mirror and cache immediately
+
+    Slot searches see the new events at once, which prevents double-booking
+    within the session; a background refresh shortly after reconciles any
+    drift with Google.
+    """
+    tz = gettz(CALENDAR_TIMEZONE)
+    mirror = get_event_mirror()
+    if mirror:
+        mirror.put(resources)
+    EVENT_CACHE.put(CompactEvent.from_api(resource, tz) for resource in resources)
+    _schedule_reconcile()
+
+_reconcile_timer = None
+_reconcile_lock = threading.Lock()
+
+def _schedule_reconcile():
+    """Refresh once, RECONCILE_DELAY seconds after the last write (bursts of writes coalesce)"""
+    global _reconcile_timer
+    with _reconcile_lock:
+        if _reconcile_timer:
+            _reconcile_timer.cancel()
+        _reconcile_timer = threading.Timer(RECONCILE_DELAY, _reconcile)
+        _reconcile_timer.daemon = True
+        _reconcile_timer.start()
+
+def _reconcile():
+    try:
+        get_upcoming_events(force_refresh=True)
+    except Exception as e:
+        # The cache TTL / next mirror sync will catch up instead
+        print(f"Cache reconcile error: {str(e)}")
+
+def _event_body(summary, start_iso, end_iso, timezone):
+    return {
         'summary': summary,
         'start': {'dateTime': start_iso, 'timeZone': timezone},
         'end': {'dateTime': end_iso, 'timeZone': timezone},
     }
-    created_event = service.events().insert(calendarId='primary', body=event).execute()
-    
-    # Force refresh of event cache
-    get_upcoming_events(force_refresh=True)
+
+def find_available_slots(duration_minutes, days_ahead=7, preferred_date=None, preferred_time_range=None,
+                         other_calendars=None, backend=SLOT_BACKEND):
+    """Find available time slots with date/time preferences and double-booking prevention
+
+    other_calendars is an optional list of BusyIndex objects (e.g. attendees) that must
+    also be free. backend is "sweep", "bitmap" (NumPy) or "auto".
+    """
+    tz = gettz(CALENDAR_TIMEZONE)
+    store = get_upcoming_events(_days_to_fetch(days_ahead, [preferred_date], tz))
+    windows = _slot_windows(days_ahead, preferred_date, preferred_time_range, tz)
+    busy_indexes = [store.busy_index] + list(other_calendars or [])
+    return _search_windows(windows, busy_indexes, duration_minutes, backend, tz)
+
+def iter_available_slots(duration_minutes, days_ahead=7, preferred_date=None, preferred_time_range=None,
+                         other_calendars=None):
+    """Lazily yield FreeSlot records (epoch seconds) in chronological order
+
+    Nothing past what the caller consumes is computed.
+    """
+    tz = gettz(CALENDAR_TIMEZONE)
+    store = get_upcoming_events(_days_to_fetch(days_ahead, [preferred_date], tz))
+    busy_index = _combined_index([store.busy_index] + list(other_calendars or []))
+    duration = duration_minutes * 60
+    step = SLOT_INTERVAL * 60
+    for window_start, window_end in _slot_windows(days_ahead, preferred_date, preferred_time_range, tz):
+        yield from busy_index.iter_free_slots(window_start, window_end, duration, step)
+
+def find_best_slots(duration_minutes, k=SLOTS_TO_OFFER, score=SLOT_RANKING, days_ahead=7, preferred_date=None,
+                    preferred_time_range=None, other_calendars=None):
+    """Top k slots as datetimes, best first
+
+    score is a SLOT_SCORES name or any callable taking a FreeSlot (lower is
+    better, e.g. utils.slot_utils.closeness_to(epoch)); "earliest" stops after
+    the first k slots, other scores keep a bounded heap of k.
+    """
+    tz = gettz(CALENDAR_TIMEZONE)
+    slots = iter_available_slots(duration_minutes, days_ahead, preferred_date, preferred_time_range, other_calendars)
+    return [datetime.fromtimestamp(slot.start, tz) for slot in top_slots(slots, k, _slot_score(score))]
+
+def find_slots_in_windows(duration_minutes, queries, limit=None, other_calendars=None, score=None):
+    """Answer several (date, time_range) slot queries with one fetch and one busy index
+
+    queries is a list of (date, time_range) pairs, time_range being None,
+    "morning", "afternoon" or "evening". Returns one slot list per query, in
+    order; each window's sweep stops once it has limit slots. With a score
+    (see find_best_slots) each list holds that window's best limit slots instead.
+    """
+    if not queries:
+        return []
+    tz = gettz(CALENDAR_TIMEZONE)
+    store = get_upcoming_events(_days_to_fetch(7, [date_obj for date_obj, _ in queries], tz))
+    busy_index = _combined_index([store.busy_index] + list(other_calendars or []))
+
+    duration = duration_minutes * 60
+    step = SLOT_INTERVAL * 60
+    score = _slot_score(score)
+    results = []
+    for date_obj, time_range in queries:
+        window_start, window_end = _slot_windows(1, date_obj, time_range, tz)[0]
+        if score:
+            slots = busy_index.iter_free_slots(window_start, window_end, duration, step)
+            starts = [slot.start for slot in top_slots(slots, limit, score)]
+        else:
+            starts = busy_index.free_slot_starts(window_start, window_end, duration, step, limit)
+        results.append([datetime.fromtimestamp(start, tz) for start in starts])
+    return results
+
+def find_common_slots(attendees, duration_minutes, days_ahead=7, preferred_date=None, preferred_time_range=None,
+                      backend=SLOT_BACKEND):
+    """Find slots when every attendee calendar is free, using the freeBusy endpoint
+
+    attendees is a list of calendar ids (email addresses, or 'primary' for your own).
+    Returns (slots, unreadable): unreadable lists the attendees whose calendar
+    freeBusy could not read (not found, no access). Their availability is
+    unknown, so the slots only cover the others; confirm with them before booking.
+    """
+    tz = gettz(CALENDAR_TIMEZONE)
+    windows = _slot_windows(days_ahead, preferred_date, preferred_time_range, tz)
+    if not windows or not attendees:
+        return [], []
     
-    return created_event.get('htmlLink')
+    # Each calendar's busy list is sorted, so a heap-based k-way merge yields one sorted stream
+    busy_lists, errors = get_free_busy(attendees, windows[0][0], windows[-1][1])
+    busy_index = BusyIndex(heapq.merge(*busy_lists.values()), presorted=True)
+    unreadable = [attendee for attendee in attendees if attendee in errors]
+    return _search_windows(windows, [busy_index], duration_minutes, backend, tz), unreadable
+
+def get_free_busy(calendar_ids, time_min, time_max):
+    """Busy intervals per calendar from freeBusy, queried in concurrent chunks
 
-def find_available_slots(duration_minutes, days_ahead=7, preferred_date=None, preferred_time_range=None):
-    """Find available time slots with date/time preferences and double-booking prevention"""
+    Returns (busy, errors): busy is {calendar_id: sorted [(start, end)]} in
+    epoch seconds for every calendar that was read, errors is {calendar_id:
+    freeBusy errors} for the rest. A calendar in errors is not known to be free.
+    """
     tz = gettz(CALENDAR_TIMEZONE)
-    events = get_upcoming_events(days_ahead)
-    slots = []
+    body = {
+        'timeMin': datetime.fromtimestamp(time_min, tz).isoformat(),
+        'timeMax': datetime.fromtimestamp(time_max, tz).isoformat(),
+        'timeZone': CALENDAR_TIMEZONE,
+    }
+    chunks = [calendar_ids[i:i + FREEBUSY_CHUNK_SIZE] for i in range(0, len(calendar_ids), FREEBUSY_CHUNK_SIZE)]
+    if not chunks:
+        return {}
+    
+    def query(chunk):
+        # get_calendar_service() hands each worker thread its own service
+        request = get_calendar_service().freebusy().query(body=dict(body, items=[{'id': c} for c in chunk]))
+        key = ('freebusy', body['timeMin'], body['timeMax'], tuple(chunk))
+        return SCHEDULER.execute(request, key=key).get('calendars', {})
     
+    busy = {}
+    errors = {}
+    for calendars in FREEBUSY_POOL.map(query, chunks):
+        for calendar_id, info in calendars.items():
+            if info.get('errors'):
+                print(f"freeBusy error for {calendar_id}: {info['errors']}")
+                errors[calendar_id] = info['errors']
+                continue
+            busy[calendar_id] = sorted(
+                (to_epoch(period['start'], tz), to_epoch(period['end'], tz))
+                for period in info.get('busy', [])
+            )
+    for calendar_id in calendar_ids:
+        if calendar_id not in busy and calendar_id not in errors:
+            errors[calendar_id] = [{'reason': 'missingFromResponse'}]
+    return busy, errors
+
+def _days_to_fetch(days_ahead, dates, tz):
+    """days_ahead, stretched so the fetched events reach the latest of dates (None entries are skipped)
+
+    Without this a date more than days_ahead out is searched against an empty
+    calendar and every slot on it looks free.
+    """
+    today = datetime.now(tz).date()
+    return max([days_ahead] + [(date_obj - today).days + 1 for date_obj in dates if date_obj])
+
+def _slot_windows(days_ahead, preferred_date, preferred_time_range, tz):
+    """Working-hour windows (epoch seconds) for every date to check"""
     # Determine dates to check
     if preferred_date:
         dates_to_check = [preferred_date]
@@ -220,6 +510,7 @@ def find_available_slots(duration_minutes, days_ahead=7, preferred_date=None, pr
     else:
         time_range = None
     
+    windows = []
     for date_obj in dates_to_check:
         # Create datetime objects for work hours
         work_start = datetime.combine(date_obj, time(WORKING_HOURS[0], 0), tzinfo=tz)
@@ -230,38 +521,41 @@ def find_available_slots(duration_minutes, days_ahead=7, preferred_date=None, pr
             work_start = max(work_start, work_start.replace(hour=time_range[0]))
             work_end = min(work_end, work_end.replace(hour=time_range[1]))
 
-        # Collect busy slots
-        busy_slots = []
-        for event in events:
-            start = event['start'].get('dateTime', event['start'].get('date'))
-            end = event['end'].get('dateTime', event['end'].get('date'))
-            
-            event_start = date_parser.parse(start).astimezone(tz)
-            event_end = date_parser.parse(end).astimezone(tz)
-            
-            # Check date overlap
-            if event_start.date() <= date_obj <= event_end.date():
-                busy_slots.append((event_start, event_end))
-
-        # Generate available slots
-        current_time = work_start
-        while current_time <= work_end - timedelta(minutes=duration_minutes):
-            slot_end = current_time + timedelta(minutes=duration_minutes)
-            
-            # Skip if beyond work hours
-            if slot_end > work_end:
-                current_time += timedelta(minutes=SLOT_INTERVAL)
-                continue
-            
-            # Check for conflicts
-            conflict = any(
-                current_time < busy_end and slot_end > busy_start
-                for busy_start, busy_end in busy_slots
-            )
-            
-            if not conflict:
-                slots.append(current_time)
-            
-            current_time += timedelta(minutes=SLOT_INTERVAL)
+        windows.append((work_start.timestamp(), work_end.timestamp()))
+    return windows
+
+def _search_windows(windows, busy_indexes, duration_minutes, backend, tz):
+    """Slot starts in every window where all busy indexes are free"""
+    # Busy intervals were parsed and merged once at fetch time (epoch seconds)
+    duration = duration_minutes * 60
+    step = SLOT_INTERVAL * 60
+    
+    if _use_bitmap(backend, len(windows)) and duration > 0:
+        # One vectorized pass over every day and calendar
+        starts = bitmap_slot_starts(windows, busy_indexes, duration, step)
+    else:
+        # Sweep the free gaps once instead of testing every slot against every event
+        busy_index = _combined_index(busy_indexes)
+        starts = [
+            start
+            for window_start, window_end in windows
+            for start in busy_index.free_slot_starts(window_start, window_end, duration, step)
+        ]
     
-    return slots
\ No newline at end of file
+    return [datetime.fromtimestamp(start, tz) for start in starts]
+
+def _slot_score(score):
+    """Resolve a SLOT_SCORES name to its score function (callables pass through)"""
+    return SLOT_SCORES[score] if isinstance(score, str) else score
+
+def _combined_index(busy_indexes):
+    """One BusyIndex that is busy whenever any of the given calendars is"""
+    if len(busy_indexes) == 1:
+        return busy_indexes[0]
+    return BusyIndex(chain.from_iterable(busy_indexes))
+
+def _use_bitmap(backend, num_days):
+    """Pick the NumPy bitmap backend when requested (or for long horizons) and available"""
+    if np is None or backend == "sweep":
+        return False
+    return backend == "bitmap" or num_days >= BITMAP_MIN_DAYS
\ No newline at end of file
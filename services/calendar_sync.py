@@ -0,0 +1,279 @@
+# services/calendar_sync.py
+import json
+import sqlite3
+import threading
+import time
+from dateutil.tz import gettz
+from googleapiclient.errors import HttpError
+from config import CALENDAR_TIMEZONE, EVENT_MIRROR_PATH, EVENTS_PAGE_SIZE, EXPAND_RECURRENCE
+from services.event_store import CompactEvent, EventStore, to_epoch
+from services.recurrence import RecurringSeries
+from services.request_scheduler import SCHEDULER
+
+# Only what slot search, date queries and sync need
+EVENT_FIELDS = "nextPageToken,nextSyncToken,items(id,status,summary,start,end)"
+# Recurring masters and their exceptions, for local expansion
+RECURRING_EVENT_FIELDS = (
+    "nextPageToken,nextSyncToken,"
+    "items(id,status,summary,start,end,recurrence,recurringEventId,originalStartTime)"
+)
+
+def iter_event_pages(service, calendar_id='primary', page_size=EVENTS_PAGE_SIZE, fields=EVENT_FIELDS, **params):
+    """Stream events.list pages, following nextPageToken until the last one
+
+    Asks for large pages (maxResults) and a field projection (fields=) so
+    busy calendars are read completely with a fraction of the payload.
+    Pages go through the request scheduler; identical page requests from
+    concurrent sessions are sent once.
+    """
+    page_token = None
+    while True:
+        request = service.events().list(
+            calendarId=calendar_id,
+            maxResults=page_size,
+            fields=fields,
+            pageToken=page_token,
+            **params
+        )
+        key = ('events.list', calendar_id, page_size, fields, page_token, tuple(sorted(params.items())))
+        page = SCHEDULER.execute(request, key=key)
+        yield page
+        page_token = page.get('nextPageToken')
+        if not page_token:
+            return
+
+def iter_events(service, calendar_id='primary', **params):
+    """Stream event resources across all pages"""
+    for page in iter_event_pages(service, calendar_id, **params):
+        yield from page.get('items', [])
+
+SCHEMA_VERSION = 2  # bump to rebuild mirrors created by older code
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    calendar_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    summary TEXT,
+    start_ts REAL NOT NULL,
+    end_ts REAL NOT NULL,
+    series_id TEXT,  -- recurring master of an exception (moved or cancelled instance)
+    original_start_ts REAL,
+    cancelled INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (calendar_id, id)
+);
+CREATE INDEX IF NOT EXISTS events_by_start ON events (calendar_id, start_ts);
+CREATE TABLE IF NOT EXISTS series (
+    calendar_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    body TEXT NOT NULL,  -- JSON master resource (summary, start, end, recurrence)
+    start_ts REAL NOT NULL,
+    last_ts REAL,  -- end of the final instance; NULL if the series never ends
+    PRIMARY KEY (calendar_id, id)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    calendar_id TEXT PRIMARY KEY,
+    sync_token TEXT,
+    synced_at REAL,
+    expand_recurrence INTEGER
+);
+"""
+
+class CalendarMirror:
+    """Persistent SQLite mirror of a calendar, kept current with incremental syncToken pulls
+
+    The Calendar service is passed to sync(), so any object exposing
+    events().list(...).execute() (e.g. a local fake backend) can drive it.
+
+    With expand_recurrence, recurring events are synced as masters plus
+    exceptions (singleEvents=False) and expanded locally with dateutil.rrule
+    when a range is read, so the sync payload no longer grows with the number
+    of instances. Expansions are cached per master.
+    """
+    def __init__(self, path=EVENT_MIRROR_PATH, calendar_id='primary', expand_recurrence=EXPAND_RECURRENCE):
+        self.path = path
+        self.calendar_id = calendar_id
+        self.expand_recurrence = expand_recurrence
+        self.tz = gettz(CALENDAR_TIMEZONE)
+        self.lock = threading.RLock()
+        self.series = {}  # master id -> (stored body, RecurringSeries with its cached expansion)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            # The mirror is only a cache of Google's data; rebuild it from scratch
+            self.conn.executescript("DROP TABLE IF EXISTS events; DROP TABLE IF EXISTS series; "
+                                    "DROP TABLE IF EXISTS sync_state;")
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.executescript(SCHEMA)
+
+    def synced_at(self):
+        """Epoch seconds of the last successful sync (persisted across restarts), or None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT synced_at FROM sync_state WHERE calendar_id = ?", (self.calendar_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def is_stale(self, max_age):
+        synced_at = self.synced_at()
+        return synced_at is None or time.time() - synced_at >= max_age
+
+    def sync(self, service):
+        """Pull changes since the last sync token; returns the number of changed events
+
+        Falls back to a full sync on first run or when Google expires the token (410 Gone).
+        """
+        with self.lock:
+            token = self._sync_token()
+            if token is not None and self._synced_mode() != self.expand_recurrence:
+                # Switching between instance and master syncs needs a full resync
+                self.clear()
+                token = None
+            try:
+                return self._pull(service, token)
+            except HttpError as e:
+                if token is None or e.resp.status != 410:
+                    raise
+                # Sync token expired: wipe the mirror and start over
+                self.clear()
+                return self._pull(service, None)
+
+    def _pull(self, service, token):
+        changed = 0
+        if self.expand_recurrence:
+            pages = iter_event_pages(service, self.calendar_id, fields=RECURRING_EVENT_FIELDS,
+                                     syncToken=token, singleEvents=False)
+        else:
+            pages = iter_event_pages(service, self.calendar_id, syncToken=token, singleEvents=True)
+
+        # Each page is applied as it arrives; the last one carries the next sync token
+        for page in pages:
+            changed += self._apply(page.get('items', []))
+
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sync_state (calendar_id, sync_token, synced_at, expand_recurrence) "
+                "VALUES (?, ?, ?, ?)",
+                (self.calendar_id, page.get('nextSyncToken'), time.time(), int(self.expand_recurrence))
+            )
+        return changed
+
+    def _apply(self, items):
+        """Upsert changed events and masters, and drop cancelled ones
+
+        A cancelled instance of a recurring series is kept as a tombstone row
+        so local expansion skips it.
+        """
+        upserts = []
+        deletes = []
+        series = []
+        for item in items:
+            original = item.get('originalStartTime')
+            if original and item.get('recurringEventId'):
+                original_start = to_epoch(original.get('dateTime', original.get('date')), self.tz)
+            else:
+                original_start = None
+
+            if item.get('status') == 'cancelled':
+                if original_start is not None:
+                    upserts.append((self.calendar_id, item['id'], '', original_start, original_start,
+                                    item['recurringEventId'], original_start, 1))
+                else:
+                    deletes.append((self.calendar_id, item['id']))
+            elif item.get('recurrence'):
+                master = RecurringSeries.from_api(item, self.tz)
+                series.append((self.calendar_id, item['id'], json.dumps(item), master.dtstart.timestamp(),
+                               master.last_end()))
+            else:
+                event = CompactEvent.from_api(item, self.tz)
+                upserts.append((self.calendar_id, event.id, event.summary, event.start, event.end,
+                                item.get('recurringEventId'), original_start, 0))
+
+        with self.conn:
+            # Deleting a master also drops its exceptions
+            self.conn.executemany("DELETE FROM events WHERE calendar_id = ? AND (id = ? OR series_id = ?)",
+                                  [(calendar_id, event_id, event_id) for calendar_id, event_id in deletes])
+            self.conn.executemany("DELETE FROM series WHERE calendar_id = ? AND id = ?", deletes)
+            # An event that gained or lost its recurrence moves between the two tables
+            self.conn.executemany("DELETE FROM events WHERE calendar_id = ? AND id = ?",
+                                  [row[:2] for row in series])
+            self.conn.executemany("DELETE FROM series WHERE calendar_id = ? AND id = ?",
+                                  [row[:2] for row in upserts if row[5] is None])
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO events (calendar_id, id, summary, start_ts, end_ts, series_id, "
+                "original_start_ts, cancelled) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                upserts
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO series (calendar_id, id, body, start_ts, last_ts) VALUES (?, ?, ?, ?, ?)",
+                series
+            )
+        return len(upserts) + len(deletes) + len(series)
+
+    def put(self, items):
+        """Write freshly created event resources through, leaving the sync token alone
+
+        The next incremental sync returns the same events and simply upserts them again.
+        """
+        with self.lock:
+            return self._apply(items)
+
+    def _sync_token(self):
+        row = self.conn.execute(
+            "SELECT sync_token FROM sync_state WHERE calendar_id = ?", (self.calendar_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _synced_mode(self):
+        """Whether the stored data came from a master (True) or instance (False) sync"""
+        row = self.conn.execute(
+            "SELECT expand_recurrence FROM sync_state WHERE calendar_id = ?", (self.calendar_id,)
+        ).fetchone()
+        return bool(row[0]) if row else None
+
+    def clear(self):
+        """Forget all mirrored events and the sync token"""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM events WHERE calendar_id = ?", (self.calendar_id,))
+            self.conn.execute("DELETE FROM series WHERE calendar_id = ?", (self.calendar_id,))
+            self.conn.execute("DELETE FROM sync_state WHERE calendar_id = ?", (self.calendar_id,))
+            self.series = {}
+
+    def store(self, time_min, time_max):
+        """EventStore of mirrored events overlapping [time_min, time_max) in epoch seconds"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, summary, start_ts, end_ts FROM events "
+                "WHERE calendar_id = ? AND cancelled = 0 AND start_ts < ? AND (end_ts > ? OR start_ts >= ?)",
+                (self.calendar_id, time_max, time_min, time_min)
+            ).fetchall()
+            events = [CompactEvent(*row) for row in rows]
+            if self.expand_recurrence:
+                events.extend(self._expand_series(time_min, time_max))
+        return EventStore(events, self.tz)
+
+    def _expand_series(self, time_min, time_max):
+        """Instances of every recurring series active in [time_min, time_max), minus its exceptions"""
+        rows = self.conn.execute(
+            "SELECT id, body FROM series WHERE calendar_id = ? AND start_ts < ? AND (last_ts IS NULL OR last_ts >= ?)",
+            (self.calendar_id, time_max, time_min)
+        ).fetchall()
+        if not rows:
+            return []
+
+        overrides = {}
+        for series_id, original_start in self.conn.execute(
+            "SELECT series_id, original_start_ts FROM events WHERE calendar_id = ? AND series_id IS NOT NULL",
+            (self.calendar_id,)
+        ):
+            overrides.setdefault(series_id, set()).add(original_start)
+
+        instances = []
+        for series_id, body in rows:
+            cached = self.series.get(series_id)
+            if cached is None or cached[0] != body:
+                # New or edited master: drop the old expansion
+                cached = (body, RecurringSeries.from_api(json.loads(body), self.tz))
+                self.series[series_id] = cached
+            master = cached[1]
+            master.overrides = overrides.get(series_id, set())
+            instances.extend(master.instances(time_min, time_max))
+        return instances
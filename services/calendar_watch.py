@@ -0,0 +1,164 @@
+# services/calendar_watch.py
+import secrets
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import WATCH_HOST, WATCH_PORT, WATCH_CHANNEL_TTL, WATCH_RENEW_MARGIN
+from gcal.auth import get_calendar_service
+from services.request_scheduler import SCHEDULER
+
+class NotificationReceiver:
+    """Local HTTP endpoint for Calendar push notifications
+
+    Google posts an empty body with X-Goog-* headers for every change to a
+    watched calendar. Requests for a known channel with the right token are
+    acknowledged at once and the channel's callback runs after the response
+    has been sent, so slow refreshes never make Google retry.
+    """
+    def __init__(self, host=WATCH_HOST, port=WATCH_PORT):
+        self.channels = {}  # channel id -> (token, callback)
+        self.notifications = 0
+        self.lock = threading.Lock()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                receiver._handle(self)
+
+            def log_message(self, format, *args):
+                pass  # keep the console for the conversation
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and free the port; safe on a receiver that never started"""
+        if self.thread is not None:
+            # shutdown() waits for serve_forever() to return, so it would block forever if that never ran
+            self.server.shutdown()
+            self.thread = None
+        self.server.server_close()
+
+    def register(self, channel_id, token, callback):
+        with self.lock:
+            self.channels[channel_id] = (token, callback)
+
+    def unregister(self, channel_id):
+        with self.lock:
+            self.channels.pop(channel_id, None)
+
+    def _handle(self, request):
+        length = int(request.headers.get('Content-Length') or 0)
+        if length:
+            request.rfile.read(length)
+
+        with self.lock:
+            entry = self.channels.get(request.headers.get('X-Goog-Channel-ID'))
+        if entry is None or request.headers.get('X-Goog-Channel-Token') != entry[0]:
+            _respond(request, 403)
+            return
+        _respond(request, 200)
+
+        # 'sync' only confirms a new channel; 'exists' / 'not_exists' mean something changed
+        self.notifications += 1
+        if request.headers.get('X-Goog-Resource-State') != 'sync':
+            try:
+                entry[1]()
+            except Exception as e:
+                print(f"Notification handling error: {str(e)}")
+
+def _respond(request, status):
+    request.send_response(status)
+    request.send_header('Content-Length', '0')
+    request.end_headers()
+    request.wfile.flush()
+
+class CalendarWatcher:
+    """Keeps an events watch channel open for one calendar, renewing it before it expires
+
+    A new channel is opened before the old one is stopped, so there is no
+    window without notifications. active() turns False if renewal fails,
+    letting callers fall back to short polling.
+    """
+    def __init__(self, receiver, address, on_change, calendar_id='primary', ttl=WATCH_CHANNEL_TTL):
+        self.receiver = receiver
+        self.address = address
+        self.on_change = on_change
+        self.calendar_id = calendar_id
+        self.ttl = ttl
+        self.channel = None
+        self.expires_at = 0
+        self._timer = None
+
+    def start(self):
+        self._open()
+        return self
+
+    def active(self):
+        return self.channel is not None and time.time() < self.expires_at
+
+    def stop(self):
+        if self._timer:
+            self._timer.cancel()
+        if self.channel:
+            self._close(self.channel)
+            self.channel = None
+
+    def _open(self):
+        channel_id = str(uuid.uuid4())
+        token = secrets.token_urlsafe(16)
+        self.receiver.register(channel_id, token, self.on_change)
+        body = {
+            'id': channel_id,
+            'type': 'web_hook',
+            'address': self.address,
+            'token': token,
+            'params': {'ttl': str(self.ttl)},
+        }
+        try:
+            channel = SCHEDULER.execute(get_calendar_service().events().watch(calendarId=self.calendar_id, body=body))
+        except Exception:
+            self.receiver.unregister(channel_id)
+            raise
+
+        previous, self.channel = self.channel, channel
+        # expiration is in milliseconds; Google may grant less than the requested TTL
+        self.expires_at = int(channel.get('expiration') or (time.time() + self.ttl) * 1000) / 1000
+        if previous:
+            self._close(previous)
+
+        # Renew WATCH_RENEW_MARGIN early, but never sooner than halfway through a short-lived channel
+        remaining = self.expires_at - time.time()
+        if self._timer:
+            self._timer.cancel()
+        self._timer = threading.Timer(max(remaining - WATCH_RENEW_MARGIN, remaining / 2, 0), self._renew)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _renew(self):
+        try:
+            self._open()
+        except Exception as e:
+            # The channel lapses; callers poll again until the next successful start()
+            print(f"Watch channel renewal failed: {str(e)}")
+
+    def _close(self, channel):
+        self.receiver.unregister(channel['id'])
+        try:
+            SCHEDULER.execute(get_calendar_service().channels().stop(
+                body={'id': channel['id'], 'resourceId': channel.get('resourceId')}
+            ))
+        except Exception as e:
+            print(f"Watch channel stop error: {str(e)}")
@@ -0,0 +1,133 @@
+# services/event_cache.py
+import threading
+import time
+from config import EVENT_CACHE_TTL, EVENT_CACHE_MAX_EVENTS
+from services.event_store import EventStore
+
+class RangeEventCache:
+    """In-memory event cache keyed by time range
+
+    Remembers which [start, end) epoch-second ranges are covered, fetches only
+    the missing sub-ranges and merges them in. Covered ranges are evicted when
+    older than the TTL, and the oldest ones go first when the cache holds more
+    than max_events events. Built EventStores are kept per range until the
+    cached events change, so a cache hit costs no sort or index build.
+    """
+    def __init__(self, ttl=EVENT_CACHE_TTL, max_events=EVENT_CACHE_MAX_EVENTS):
+        self.ttl = ttl
+        self.max_events = max_events
+        self.segments = []  # sorted, non-overlapping [start, end, fetched_at]
+        self.events = {}  # event id -> CompactEvent
+        self.stores = {}  # (start, end) -> EventStore built from the current events
+        self.lock = threading.RLock()
+
+    def get(self, start, end, fetch):
+        """Return an EventStore for [start, end), calling fetch(sub_start, sub_end) for uncovered gaps
+
+        fetch must return an iterable of CompactEvent overlapping the sub-range.
+        """
+        with self.lock:
+            for gap_start, gap_end in self.missing(start, end):
+                self.add(gap_start, gap_end, fetch(gap_start, gap_end))
+            return self.store(start, end)
+
+    def store(self, start, end):
+        """EventStore of the cached events overlapping [start, end), without fetching"""
+        with self.lock:
+            self._evict()
+            store = self.stores.get((start, end))
+            if store is None:
+                store = self.stores[(start, end)] = EventStore(
+                    e for e in self.events.values() if _overlaps(e, start, end)
+                )
+            return store
+
+    def missing(self, start, end):
+        """Sub-ranges of [start, end) not covered by a live (unexpired) segment"""
+        with self.lock:
+            self._expire()
+            gaps = []
+            cursor = start
+            for seg_start, seg_end, _ in self.segments:
+                if seg_end <= cursor:
+                    continue
+                if seg_start >= end:
+                    break
+                if seg_start > cursor:
+                    gaps.append((cursor, seg_start))
+                cursor = max(cursor, seg_end)
+            if cursor < end:
+                gaps.append((cursor, end))
+            return gaps
+
+    def add(self, start, end, events):
+        """Record a freshly fetched range; it replaces whatever was cached inside it"""
+        with self.lock:
+            # Events in the range that the fetch did not return were deleted upstream
+            self._drop_events(lambda e: _overlaps(e, start, end))
+            for event in events:
+                self.events[event.id] = event
+            self.stores = {}
+
+            # Merge the new segment, keeping older neighbours' timestamps outside it
+            now = time.time()
+            segments = []
+            for seg in self.segments:
+                seg_start, seg_end, fetched_at = seg
+                if seg_end <= start or seg_start >= end:
+                    segments.append(seg)
+                    continue
+                if seg_start < start:
+                    segments.append([seg_start, start, fetched_at])
+                if seg_end > end:
+                    segments.append([end, seg_end, fetched_at])
+            segments.append([start, end, now])
+            self.segments = sorted(segments)
+
+    def put(self, events):
+        """Write freshly created events through to the covered ranges they fall in
+
+        Events outside every covered range are skipped; the fetch that covers
+        them will bring them in.
+        """
+        with self.lock:
+            for event in events:
+                if any(_overlaps(event, seg_start, seg_end) for seg_start, seg_end, _ in self.segments):
+                    self.events[event.id] = event
+                    self.stores = {}
+
+    def clear(self):
+        with self.lock:
+            self.segments = []
+            self.events = {}
+            self.stores = {}
+
+    def _expire(self):
+        """Drop covered ranges older than the TTL"""
+        cutoff = time.time() - self.ttl
+        if any(fetched_at < cutoff for _, _, fetched_at in self.segments):
+            self.segments = [seg for seg in self.segments if seg[2] >= cutoff]
+            self._drop_uncovered()
+
+    def _evict(self):
+        """Drop the oldest covered ranges until the event count fits"""
+        while len(self.events) > self.max_events and len(self.segments) > 1:
+            oldest = min(self.segments, key=lambda seg: seg[2])
+            self.segments.remove(oldest)
+            self._drop_uncovered()
+
+    def _drop_uncovered(self):
+        self._drop_events(lambda e: not any(
+            _overlaps(e, seg_start, seg_end) for seg_start, seg_end, _ in self.segments
+        ))
+
+    def _drop_events(self, predicate):
+        dropped = [event_id for event_id, e in self.events.items() if predicate(e)]
+        for event_id in dropped:
+            del self.events[event_id]
+        if dropped:
+            self.stores = {}
+
+def _overlaps(event, start, end):
+    """True if the event overlaps [start, end) (zero-length events count at their start)"""
+    return event.start < end and (event.end > start or event.start >= start)
@@ -0,0 +1,74 @@
+# services/event_store.py
+from bisect import bisect_left
+from datetime import datetime, time, timedelta
+from dateutil import parser as date_parser
+from dateutil.tz import gettz
+from config import CALENDAR_TIMEZONE
+from utils.slot_utils import BusyIndex
+
+def to_epoch(value, tz):
+    """Parse an API dateTime/date string into epoch seconds (all-day dates use the calendar timezone)"""
+    try:
+        # Fast path for the RFC 3339 strings the API returns
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        parsed = date_parser.parse(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=tz)
+    return parsed.timestamp()
+
+class CompactEvent:
+    """Pre-parsed calendar event: epoch-second start/end plus summary and id"""
+    __slots__ = ("id", "summary", "start", "end")
+
+    def __init__(self, id, summary, start, end):
+        self.id = id
+        self.summary = summary
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def from_api(cls, event, tz):
+        """Build from a Google Calendar event resource"""
+        start = event['start'].get('dateTime', event['start'].get('date'))
+        end = event['end'].get('dateTime', event['end'].get('date'))
+        return cls(event.get('id'), event.get('summary', ''), to_epoch(start, tz), to_epoch(end, tz))
+
+    def start_datetime(self, tz):
+        return datetime.fromtimestamp(self.start, tz)
+
+    def end_datetime(self, tz):
+        return datetime.fromtimestamp(self.end, tz)
+
+    def __repr__(self):
+        return f"CompactEvent({self.id!r}, {self.summary!r}, {self.start}, {self.end})"
+
+class EventStore:
+    """Events parsed once per fetch, sorted by start, with a busy index in epoch seconds"""
+    def __init__(self, events=(), tz=None):
+        self.tz = tz or gettz(CALENDAR_TIMEZONE)
+        self.events = sorted(events, key=lambda e: (e.start, e.end))
+        self.starts = [e.start for e in self.events]
+        self.busy_index = BusyIndex((e.start, e.end) for e in self.events)
+
+    @classmethod
+    def from_api_events(cls, items, tz=None):
+        tz = tz or gettz(CALENDAR_TIMEZONE)
+        return cls((CompactEvent.from_api(item, tz) for item in items), tz)
+
+    def __len__(self):
+        return len(self.events)
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def between(self, start, end):
+        """Events overlapping [start, end) in epoch seconds"""
+        stop = bisect_left(self.starts, end)
+        return [e for e in self.events[:stop] if e.end > start or e.start >= start]
+
+    def on_date(self, date_obj):
+        """Events overlapping a calendar day in the store's timezone"""
+        day_start = datetime.combine(date_obj, time(0, 0), tzinfo=self.tz)
+        day_end = day_start + timedelta(days=1)
+        return self.between(day_start.timestamp(), day_end.timestamp())
@@ -0,0 +1,275 @@
+# services/llm_dispatcher.py
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from config import LLM_MAX_CONCURRENCY, LLM_DISPATCH_HISTORY
+
+# Lower runs first: short extractions gate the conversation, replies can wait a moment
+PRIORITIES = {"extract": 0, "respond": 1}
+
+class _Flight:
+    """One in-progress call that identical requests wait on"""
+    def __init__(self, key):
+        self.key = key
+        self.callers = set()  # tokens of the callers still waiting for the result
+        self.abandoned = threading.Event()  # set once every caller has given up; the call then stops
+        self.done = threading.Event()
+        self.pieces = []  # results so far of a streamed call (see LLMDispatcher.stream)
+        self.result = None
+        self.error = None
+        self.timing = None
+
+class LLMDispatcher:
+    """Admission queue in front of Ollama, shared by every conversation
+
+    At most max_concurrency calls run at once (Ollama would only serialize
+    the rest); waiting calls are admitted by task priority, then arrival.
+    Identical calls already in flight are coalesced: the later ones wait for
+    the first and share its result, and the call runs on while any of them
+    still wants it, whoever cancels. Each call gets a timing record with its
+    queue wait and inference time; the latest are kept in timings.
+    """
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, history=LLM_DISPATCH_HISTORY):
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self.waiting = []  # heap of (priority, arrival) tickets
+        self.arrivals = itertools.count()
+        self.cond = threading.Condition()
+        self.flights = {}  # coalescing key -> _Flight
+        self.holders = {}  # cancel event -> release() of the slot its call holds
+        self.timings = deque(maxlen=history)
+        self.coalesced = 0
+
+    @contextmanager
+    def slot(self, task, cancel=None):
+        """Hold a backend slot for the duration of the block
+
+        Yields the call's timing record (queue_wait set, inference filled in
+        on exit), or None if cancel (a threading.Event) was set while waiting.
+        """
+        timing = {'task': task, 'queue_wait': 0.0, 'inference': None, 'coalesced': False}
+        queued = time.perf_counter()
+        if not self._acquire(PRIORITIES.get(task, len(PRIORITIES)), cancel):
+            yield None
+            return
+        started = time.perf_counter()
+        timing['queue_wait'] = started - queued
+
+        def release():
+            # Once only: cancel() may already have given the slot up
+            with self.cond:
+                if timing['inference'] is not None:
+                    return
+                timing['inference'] = time.perf_counter() - started
+                self.active -= 1
+                self.cond.notify_all()
+
+        if cancel is not None:
+            with self.cond:
+                self.holders[cancel] = release
+        try:
+            yield timing
+        finally:
+            release()
+            if cancel is not None:
+                with self.cond:
+                    self.holders.pop(cancel, None)
+            self.timings.append(timing)
+
+    def run(self, task, key, func, cancel=None):
+        """func(abandoned) inside a slot, coalesced with identical calls (same key) in flight
+
+        Returns (result, timing), or (None, None) if cancel was set first.
+        The first caller's call serves everyone who joins it; cancelling only
+        ends that caller's own wait. func is handed the flight's abandoned
+        event (None if the first caller cannot cancel), set once every caller
+        has given up, so a streamed call can stop.
+        """
+        token = cancel if cancel is not None else object()
+        flight, leader = self._join(key, token)
+        if not leader:
+            queued = time.perf_counter()
+            while not flight.done.wait(0.05):
+                if cancel is not None and cancel.is_set():
+                    self._leave(flight, token)
+                    return None, None
+            self._leave(flight, token)
+            if flight.error is not None:
+                raise flight.error
+            if flight.timing is None:
+                return None, None
+            # Time spent waiting on the first call's inference counts as inference, the rest as queueing
+            waited = time.perf_counter() - queued
+            inference = min(waited, flight.timing['inference'])
+            timing = dict(flight.timing, queue_wait=waited - inference, inference=inference, coalesced=True)
+            self.timings.append(timing)
+            return flight.result, timing
+
+        abandoned = flight.abandoned if cancel is not None else None
+        try:
+            with self.slot(task, abandoned) as timing:
+                if timing is not None:
+                    flight.result = func(abandoned)
+            flight.timing = timing
+        except Exception as e:
+            flight.error = e
+        finally:
+            self._land(flight)
+            self._leave(flight, token)
+        if flight.error is not None:
+            raise flight.error
+        if cancel is not None and cancel.is_set():
+            return None, None
+        return flight.result, flight.timing
+
+    def stream(self, task, key, func, cancel=None):
+        """Yield the pieces of func(abandoned) (a generator), coalesced like run
+
+        The first caller starts the call on its own thread, so every caller,
+        the first included, reads the same pieces at its own pace; one that
+        stops iterating (or whose cancel is set) only ends its own stream.
+        Pieces stop early, without an error, if no slot was granted.
+        Streamed and whole calls never share a flight, even with equal keys.
+        """
+        token = cancel if cancel is not None else object()
+        flight, leader = self._join(("stream", key), token)
+        if leader:
+            threading.Thread(target=self._produce, args=(task, flight, func), daemon=True).start()
+        try:
+            index = 0
+            while True:
+                with self.cond:
+                    while index == len(flight.pieces) and not flight.done.is_set():
+                        if cancel is not None and cancel.is_set():
+                            return
+                        self.cond.wait(0.05 if cancel is not None else None)
+                    if index == len(flight.pieces):
+                        if flight.error is not None:
+                            raise flight.error
+                        return
+                    piece = flight.pieces[index]
+                index += 1
+                yield piece
+        finally:
+            self._leave(flight, token)
+
+    def cancel(self, cancel):
+        """Drop the call watching cancel (already set) right away
+
+        Its own wait ends; the call itself stops, and its slot is freed at
+        once, only if no other caller still wants the result. A streamed call
+        only notices cancel between fragments, and Ollama sends nothing before
+        the first token; the slot should not sit idle until then. Calls still
+        queued are woken to drop out.
+        """
+        with self.cond:
+            flight = next((flight for flight in self.flights.values() if cancel in flight.callers), None)
+            release = None
+            if flight is None:
+                release = self.holders.pop(cancel, None)
+            self.cond.notify_all()
+        if flight is not None:
+            self._leave(flight, cancel)
+        elif release is not None:
+            release()
+
+    def _join(self, key, token):
+        """Wait on the flight for key as token: (flight, whether this caller leads it and runs the call)"""
+        with self.cond:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight(key)
+            else:
+                self.coalesced += 1
+            flight.callers.add(token)
+            return flight, leader
+
+    def _leave(self, flight, token):
+        """Stop waiting on flight; the last caller to leave an unfinished call abandons it"""
+        with self.cond:
+            if token not in flight.callers:
+                return
+            flight.callers.discard(token)
+            if flight.callers or flight.done.is_set():
+                return
+            flight.abandoned.set()
+            # Later identical calls start afresh instead of joining a call that is stopping
+            if self.flights.get(flight.key) is flight:
+                del self.flights[flight.key]
+            release = self.holders.pop(flight.abandoned, None)
+            self.cond.notify_all()
+        if release is not None:
+            release()
+
+    def _land(self, flight):
+        """Publish the flight's outcome and wake every caller waiting on it"""
+        with self.cond:
+            if self.flights.get(flight.key) is flight:
+                del self.flights[flight.key]
+            flight.done.set()
+            self.cond.notify_all()
+
+    def _produce(self, task, flight, func):
+        """Run a streamed call for every caller of flight, publishing its pieces as they arrive"""
+        try:
+            with self.slot(task, flight.abandoned) as timing:
+                if timing is not None:
+                    pieces = func(flight.abandoned)
+                    try:
+                        for piece in pieces:
+                            with self.cond:
+                                flight.pieces.append(piece)
+                                self.cond.notify_all()
+                            if flight.abandoned.is_set():
+                                break
+                    finally:
+                        pieces.close()
+            flight.timing = timing
+        except Exception as e:
+            flight.error = e
+        finally:
+            self._land(flight)
+
+    def stats(self):
+        """Queue wait vs inference time (mean and p95 seconds) per task over the recent calls"""
+        summary = {'active': self.active, 'waiting': len(self.waiting), 'coalesced': self.coalesced, 'tasks': {}}
+        timings = list(self.timings)
+        for task in {timing['task'] for timing in timings}:
+            records = [timing for timing in timings if timing['task'] == task and timing['inference'] is not None]
+            if not records:
+                continue
+            summary['tasks'][task] = {
+                'calls': len(records),
+                'queue_wait': _mean_p95([record['queue_wait'] for record in records]),
+                'inference': _mean_p95([record['inference'] for record in records]),
+            }
+        return summary
+
+    def _acquire(self, priority, cancel):
+        ticket = (priority, next(self.arrivals))
+        with self.cond:
+            heapq.heappush(self.waiting, ticket)
+            while self.active >= self.max_concurrency or self.waiting[0] != ticket:
+                if cancel is not None and cancel.is_set():
+                    self.waiting.remove(ticket)
+                    heapq.heapify(self.waiting)
+                    self.cond.notify_all()
+                    return False
+                self.cond.wait(0.05 if cancel is not None else None)
+            heapq.heappop(self.waiting)
+            self.active += 1
+            # The next ticket may fit into another free slot
+            self.cond.notify_all()
+            return True
+
+def _mean_p95(values):
+    ordered = sorted(values)
+    p95 = ordered[math.ceil(0.95 * len(ordered)) - 1]  # nearest rank
+    return {'mean': round(sum(ordered) / len(ordered), 4), 'p95': round(p95, 4)}
+
+DISPATCHER = LLMDispatcher()
@@ -2,67 +2,295 @@
 import requests
 import json
 import re
-from config import LLM_URL, LLM_MODEL, LLM_TEMPERATURE, LLM_CONVERSATION_TEMP
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from config import LLM_URL, LLM_MODEL, LLM_FAST_MODEL, LLM_TEMPERATURE, LLM_CONVERSATION_TEMP
+from config import LLM_KEEP_ALIVE, LLM_WARMUP, LLM_POOL_SIZE, LLM_COLD_LOAD_THRESHOLD, LLM_STREAM_MIN_CLAUSE
+from config import LLM_STATE_TOKEN_BUDGET
+from services.llm_dispatcher import DISPATCHER
+from services.model_router import ROUTER
+from services.nlu_cache import UtteranceCache, utterance_key
+from utils.speech_utils import speech_chunks
+
+# Fixed instructions go in Ollama's system field, ahead of the per-turn text. The
+# prefix is identical on every call, so Ollama reuses its cached evaluation and
+# only the utterance / state is prefilled each turn.
+EXTRACTION_SYSTEM = """You are an expert calendar assistant. Extract meeting parameters from the user's request.
+
+Focus on:
+- Event summary
+- Date (handle formats like 'twenty fourth june')
+- Time/duration
+
+Return JSON with:
+- "summary": string or null
+- "date": string (natural language date)
+- "time_range": string
+- "duration": integer or null
+- "intent": "schedule/query/cancel"
+"""
+
+RESPONSE_SYSTEM = """You are a scheduling assistant. Each message is the current conversation state as JSON.
+Respond in 1 SHORT sentence. Be concise."""
+
+def compact_state(state, token_budget=LLM_STATE_TOKEN_BUDGET):
+    """Conversation state as minified JSON that fits roughly token_budget tokens
+    
+    Empty fields are dropped. While the text is over budget the longest list
+    is halved, and once no list can shrink further the largest field goes.
+    """
+    state = {key: value for key, value in state.items() if value not in (None, "", [], {})}
+    text = json.dumps(state, separators=(",", ":"), default=str)
+    while _estimate_tokens(text) > token_budget and state:
+        lists = [key for key, value in state.items() if isinstance(value, list) and len(value) > 1]
+        if lists:
+            key = max(lists, key=lambda key: len(state[key]))
+            state[key] = state[key][:len(state[key]) // 2]
+        else:
+            del state[max(state, key=lambda key: len(json.dumps(state[key], default=str)))]
+        text = json.dumps(state, separators=(",", ":"), default=str)
+    return text
+
+def _estimate_tokens(text):
+    return len(text) // 4 + 1  # about four characters per token for English / JSON
+
+
+def _parse_extraction(body):
+    """Parameters from an extraction reply, or None unless they name an intent"""
+    params = body.get("response", {})
+    # With format=json Ollama returns the object as a JSON string
+    if isinstance(params, str):
+        params = json.loads(params)
+    return params if isinstance(params, dict) and params.get("intent") else None
 
 class LLMService:
-    def __init__(self):
+    """Ollama client on a pooled keep-alive session
+    
+    Models are loaded in the background at startup and kept resident for
+    keep_alive, so the first user request does not pay for a model load.
+    Requests that still hit a cold model are counted in cold_loads, and
+    prompt_stats tracks prompt evaluation (prefill) per call.
+    Extraction results are memoized per normalized utterance in
+    extraction_cache (see services.nlu_cache). The model for each call is
+    picked by router (see services.model_router), which is told how every
+    call went. All calls go through dispatcher (see services.llm_dispatcher),
+    which caps concurrency across conversations, serves extraction first and
+    coalesces identical prompts; its timings record queue wait vs inference.
+    """
+    def __init__(self, keep_alive=LLM_KEEP_ALIVE, warm_up=LLM_WARMUP, extraction_cache=None, router=ROUTER,
+                 dispatcher=DISPATCHER):
         self.base_url = LLM_URL
         self.default_model = LLM_MODEL
+        self.keep_alive = keep_alive
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=LLM_POOL_SIZE))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=LLM_POOL_SIZE))
+        self.cold_loads = 0
+        self.last_request_cold = False
+        self.prompt_stats = {'calls': 0, 'prompt_tokens': 0, 'prompt_eval_seconds': 0.0, 'last': None}
+        self.extraction_cache = extraction_cache if extraction_cache is not None else UtteranceCache()
+        self.router = router
+        self.dispatcher = dispatcher
+        if warm_up:
+            threading.Thread(target=self.warm_up, daemon=True).start()
     
-    def extract_parameters(self, user_input):
-        """Improved parameter extraction with fallback to faster model"""
-        # Use smaller model for short queries
-        model = "llama3" if len(user_input.split()) < 10 else self.default_model
+    def warm_up(self, models=(LLM_MODEL, LLM_FAST_MODEL)):
+        """Load models into Ollama ahead of the first request (a generate call without a prompt only loads)"""
+        for model in models:
+            try:
+                self.session.post(self.base_url, json={"model": model, "keep_alive": self.keep_alive}, timeout=60)
+            except Exception as e:
+                print(f"LLM warm-up error ({model}): {str(e)}")
+    
+    def _generate(self, task, payload, timeout, parse, cancel=None):
+        """Run a generate request for task through the dispatcher: (parse(body), dispatch timing)
         
-        prompt = f"""
-        You are an expert calendar assistant. Extract meeting parameters from:
-        "{user_input}"
+        payload has no model yet. Identical prompts already in flight are
+        joined before any model is routed, so only calls that reach Ollama
+        are routed and counted by the router. parse returns None for output
+        that is not usable. With cancel, the result is (None, None) if it is
+        set before the call completes; the request itself is only dropped
+        once every caller sharing it has cancelled.
+        """
+        payload = dict(payload, keep_alive=self.keep_alive)
+        return self.dispatcher.run(task, json.dumps(payload, sort_keys=True),
+                                   lambda abandoned: self._routed(task, payload, timeout, parse, abandoned), cancel)
+    
+    def _routed(self, task, payload, timeout, parse, cancel):
+        """Send payload to the model the router picks for task (inside a dispatcher slot)
         
-        Focus on:
-        - Event summary
-        - Date (handle formats like 'twenty fourth june')
-        - Time/duration
+        With cancel the reply is streamed, so the request can be dropped once it is set.
+        """
+        model = self.router.choose(task)
+        payload = dict(payload, model=model)
+        start = time.perf_counter()
+        latency, result = None, None  # no latency sample if the call is cancelled
+        try:
+            body = self._post(payload, timeout) if cancel is None else self._collect(payload, timeout, cancel)
+            if body is None:
+                return None
+            # Model load time says nothing about how fast the model answers
+            latency = time.perf_counter() - start - body.get("load_duration", 0) / 1e9
+            result = parse(body)
+            return result
+        except Exception:
+            latency = time.perf_counter() - start
+            raise
+        finally:
+            self.router.finish(model, latency, result is not None)
+    
+    def _post(self, payload, timeout):
+        """POST a generate request on the pooled session"""
+        response = self.session.post(self.base_url, json=payload, timeout=timeout)
+        body = response.json()
+        self._record_stats(payload['model'], body)
+        return body
+    
+    def _stream(self, payload, timeout, stats=None):
+        """POST a streaming generate request and yield response fragments as Ollama produces them
         
-        Return JSON with:
-        - "summary": string or null
-        - "date": string (natural language date)
-        - "time_range": string
-        - "duration": integer or null
-        - "intent": "schedule/query/cancel"
+        The final chunk's statistics (load_duration, eval counts) are copied into stats if given.
         """
+        payload = dict(payload, keep_alive=self.keep_alive, stream=True)
+        # Ollama streams NDJSON: one object per line, the last one has done=true and the stats
+        with self.session.post(self.base_url, json=payload, timeout=timeout, stream=True) as response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("response"):
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    self._record_stats(payload['model'], chunk)
+                    if stats is not None:
+                        stats.update(chunk)
+                    return
+    
+    def _collect(self, payload, timeout, cancel):
+        """Like _post, but streamed so it can be dropped: None if cancel is set before it completes"""
+        body = {}
+        text = ""
+        fragments = self._stream(payload, timeout, stats=body)
+        try:
+            for fragment in fragments:
+                if cancel.is_set():
+                    return None
+                text += fragment
+        finally:
+            fragments.close()
+        return dict(body, response=text)
+    
+    def _record_stats(self, model, body):
+        # Durations are in nanoseconds; load_duration is near zero when the model was already resident
+        load_seconds = body.get("load_duration", 0) / 1e9
+        self.last_request_cold = load_seconds > LLM_COLD_LOAD_THRESHOLD
+        if self.last_request_cold:
+            self.cold_loads += 1
+            print(f"⚠️ Cold model load: {model} took {load_seconds:.2f}s to load")
+        
+        # prompt_eval_count covers only the tokens Ollama had to prefill (cached prefixes are skipped)
+        last = {
+            'model': model,
+            'prompt_tokens': body.get("prompt_eval_count", 0),
+            'prompt_eval_seconds': body.get("prompt_eval_duration", 0) / 1e9,
+        }
+        self.prompt_stats['calls'] += 1
+        self.prompt_stats['prompt_tokens'] += last['prompt_tokens']
+        self.prompt_stats['prompt_eval_seconds'] += last['prompt_eval_seconds']
+        self.prompt_stats['last'] = last
+    
+    def extract_parameters(self, user_input):
+        """LLM parameter extraction, answered from the utterance cache when the command was seen before
+        
+        Falls back to a date query when the LLM fails.
+        """
+        params = self.try_extract_parameters(user_input)
+        return params if params is not None else {"intent": "query", "date": user_input}  # Fallback
+    
+    def try_extract_parameters(self, user_input, cancel=None):
+        """LLM extraction without the fallback: None if it fails, or if cancel (a threading.Event) is set first
+        
+        With cancel, the reply is streamed and checked between fragments;
+        dropping the connection makes Ollama stop generating.
+        """
+        # Repeated commands ("what's on friday") are answered from the cache
+        key = utterance_key(user_input)
+        cached = self.extraction_cache.get(key)
+        if cached is not None:
+            return dict(cached)
+        
+        if cancel is not None and cancel.is_set():
+            return None
         
         payload = {
-            "model": model,
-            "prompt": prompt,
+            "system": EXTRACTION_SYSTEM,
+            "prompt": user_input,
             "format": "json",
             "stream": False,
             "options": {"temperature": 0.1, "num_predict": 100}
         }
-        
         try:
-            response = requests.post(self.base_url, json=payload, timeout=3)
-            return response.json().get("response", {})
-        except:
-            return {"intent": "query", "date": user_input}  # Fallback
+            params, timing = self._generate("extract", payload, 3, _parse_extraction, cancel)
+            if params is None:
+                return None
+            self.extraction_cache.put(key, params, cost=timing['inference'])
+            return dict(params)
+        except Exception as e:
+            print(f"LLM extraction error: {str(e)}")
+            return None
     
     def generate_conversation_response(self, conversation_state):
         """Generate response with optimized prompt"""
-        prompt = f"""
-        You are a scheduling assistant. Given this context:
-        {json.dumps(conversation_state, indent=2)}
+        try:
+            text, _ = self._generate("respond", self._response_payload(conversation_state), 3,
+                                     lambda body: body.get("response", "").strip() or None)
+            return text or ""
+        except:
+            return "Please repeat that."
+    
+    def stream_conversation_response(self, conversation_state):
+        """Like generate_conversation_response, but yields the reply in speakable pieces while it is generated
         
-        Respond in 1 SHORT sentence. Be concise.
+        Pieces end at sentence or clause boundaries (see utils.speech_utils),
+        so TTS can start on the first one long before generation finishes.
+        Identical replies in flight are shared through the dispatcher.
         """
-        
-        payload = {
-            "model": "gemma:2b",  # Always use fast model for responses
-            "prompt": prompt,
+        payload = dict(self._response_payload(conversation_state), keep_alive=self.keep_alive)
+        spoken = False
+        try:
+            for piece in self.dispatcher.stream("respond", json.dumps(payload, sort_keys=True),
+                                                lambda abandoned: self._routed_stream(payload)):
+                spoken = True
+                yield piece
+        except Exception as e:
+            print(f"LLM streaming error: {str(e)}")
+            if not spoken:
+                yield "Please repeat that."
+    
+    def _routed_stream(self, payload):
+        """Stream payload from the model the router picks for replies, in speakable pieces (inside a dispatcher slot)"""
+        model = self.router.choose("respond")
+        stats = {}
+        latency = None  # stays None if every listener stops early
+        spoken = False
+        start = time.perf_counter()
+        try:
+            for piece in speech_chunks(self._stream(dict(payload, model=model), timeout=3, stats=stats),
+                                       LLM_STREAM_MIN_CLAUSE):
+                spoken = True
+                yield piece
+            latency = time.perf_counter() - start - stats.get("load_duration", 0) / 1e9
+        except Exception:
+            latency = time.perf_counter() - start
+            raise
+        finally:
+            self.router.finish(model, latency, spoken)
+    
+    def _response_payload(self, conversation_state):
+        return {
+            "system": RESPONSE_SYSTEM,
+            "prompt": compact_state(conversation_state),
             "stream": False,
             "options": {"temperature": 0.7, "num_predict": 50}
         }
-        
-        try:
-            response = requests.post(self.base_url, json=payload, timeout=3)
-            return response.json().get("response", "").strip()
-        except:
-            return "Please repeat that."
\ No newline at end of file
@@ -0,0 +1,137 @@
+# services/model_router.py
+import math
+import threading
+import time
+from collections import deque
+from config import LLM_MODEL, LLM_FAST_MODEL, LLM_LATENCY_BUDGETS
+from config import ROUTER_WINDOW, ROUTER_MIN_VALIDITY, ROUTER_PROBE_INTERVAL, ROUTER_LOG_SIZE
+
+# Models per call type, most preferred first
+ROUTES = {
+    "extract": [LLM_MODEL, LLM_FAST_MODEL],  # the big model parses better when it has time
+    "respond": [LLM_FAST_MODEL, LLM_MODEL],  # short replies; the big model is only a failover
+}
+
+class ModelStats:
+    """Rolling latency and validity of one model's recent calls"""
+    def __init__(self, window):
+        self.latencies = deque(maxlen=window)  # seconds, excluding model load time
+        self.valid = deque(maxlen=window)  # True if the call succeeded and its output parsed
+        self.in_flight = 0
+        self.last_used = 0.0
+
+    def p95(self):
+        if not self.latencies:
+            return None
+        # Nearest rank, so a small window reports its slowest call rather than rounding it away
+        ordered = sorted(self.latencies)
+        return ordered[math.ceil(0.95 * len(ordered)) - 1]
+
+    def validity(self):
+        return sum(self.valid) / len(self.valid) if self.valid else None
+
+class ModelRouter:
+    """Chooses an Ollama model per call from recent latency and output validity
+
+    The first model on a route whose expected latency fits the call type's
+    budget is used. Expected latency is the model's rolling p95 times the
+    requests already queued on it (Ollama works through them one at a time),
+    so under load calls spill over to the smaller model. Models whose recent
+    output rarely parses are skipped. A model that has been passed over for
+    probe_interval seconds gets one call, so its stats never go stale.
+    Every decision is kept in decisions for reporting; the route is only
+    printed when a call type switches model.
+    """
+    def __init__(self, routes=None, budgets=LLM_LATENCY_BUDGETS, window=ROUTER_WINDOW,
+                 min_validity=ROUTER_MIN_VALIDITY, probe_interval=ROUTER_PROBE_INTERVAL, log_size=ROUTER_LOG_SIZE):
+        self.routes = routes or ROUTES
+        self.budgets = budgets
+        self.window = window
+        self.min_validity = min_validity
+        self.probe_interval = probe_interval
+        self.stats = {}  # model -> ModelStats
+        self.decisions = deque(maxlen=log_size)
+        self.current = {}  # task -> model its last call went to
+        self.lock = threading.Lock()
+
+    def choose(self, task, budget=None):
+        """Pick a model for a call of type task and mark it in flight (pair with finish())"""
+        budget = self.budgets[task] if budget is None else budget
+        now = time.time()
+        with self.lock:
+            candidates = self.routes[task]
+            estimates = {model: self._expected(model) for model in candidates}
+            chosen, reason, skipped = None, None, []
+            for model in candidates:
+                stats = self._stats(model)
+                validity = stats.validity()
+                if stats.last_used and now - stats.last_used > self.probe_interval:
+                    chosen, reason = model, "probe"
+                elif validity is not None and len(stats.valid) >= 5 and validity < self.min_validity:
+                    skipped.append(f"{model} validity {validity:.0%}")
+                elif estimates[model] is None or estimates[model] <= budget:
+                    chosen, reason = model, "within budget"
+                else:
+                    skipped.append(f"{model} ~{estimates[model]:.2f}s")
+                if chosen:
+                    break
+            if chosen is None:
+                # Nothing fits: take whichever should answer soonest
+                chosen = min(candidates, key=lambda model: estimates[model] or 0)
+                reason = "over budget, fastest"
+            if skipped:
+                reason += f"; skipped {', '.join(skipped)}"
+
+            previous = self.current.get(task, candidates[0])
+            self.current[task] = chosen
+            stats = self._stats(chosen)
+            stats.in_flight += 1
+            stats.last_used = now
+            self.decisions.append({
+                'time': now, 'task': task, 'model': chosen, 'reason': reason, 'budget': budget,
+                'estimates': {model: round(value, 3) if value is not None else None for model, value in estimates.items()},
+            })
+        if chosen != previous:
+            print(f"↪ {task} routed to {chosen} ({reason})")
+        return chosen
+
+    def finish(self, model, latency=None, valid=False):
+        """Record a call's outcome; latency None means it was cancelled (no sample)"""
+        with self.lock:
+            stats = self._stats(model)
+            stats.in_flight = max(0, stats.in_flight - 1)
+            if latency is not None:
+                stats.latencies.append(latency)
+                stats.valid.append(valid)
+
+    def report(self):
+        """Per-model latency / validity and how often each model was chosen"""
+        with self.lock:
+            chosen = {}
+            for decision in self.decisions:
+                key = (decision['task'], decision['model'])
+                chosen[key] = chosen.get(key, 0) + 1
+            return {
+                'models': {
+                    model: {
+                        'p95': stats.p95(),
+                        'validity': stats.validity(),
+                        'samples': len(stats.latencies),
+                        'in_flight': stats.in_flight,
+                    }
+                    for model, stats in self.stats.items()
+                },
+                'decisions': {f"{task}:{model}": count for (task, model), count in chosen.items()},
+            }
+
+    def _expected(self, model):
+        stats = self._stats(model)
+        p95 = stats.p95()
+        return None if p95 is None else p95 * (stats.in_flight + 1)
+
+    def _stats(self, model):
+        if model not in self.stats:
+            self.stats[model] = ModelStats(self.window)
+        return self.stats[model]
+
+ROUTER = ModelRouter()
@@ -0,0 +1,134 @@
+# services/nlu.py
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import NLU_CONFIDENCE_THRESHOLD, NLU_MAX_WORKERS
+from services.nlu_cache import normalize_utterance
+from utils.time_utils import MONTH_MAP, parse_relative_date
+
+WEEKDAYS = "monday|tuesday|wednesday|thursday|friday|saturday|sunday"
+INTENT_PATTERNS = [
+    ("cancel", re.compile(r"\b(?:cancel|delete|remove|call off)\b")),
+    ("schedule", re.compile(r"\b(?:schedule|book|set up|arrange|plan|add|create)\b")),
+    ("query", re.compile(r"\b(?:what is on|whats on|any (?:events?|meetings?)|do i have|am i free|show|list|check)\b")),
+]
+DATE_PATTERN = re.compile(
+    rf"\b(?:day after tomorrow|today|tonight|tomorrow|(?:next |this )?(?:{WEEKDAYS})|next week|next month|"
+    rf"\d{{1,2}} (?:{'|'.join(MONTH_MAP)}))\b"
+)
+TIME_PATTERN = re.compile(r"\b(?:morning|afternoon|evening|night|\d{1,2}(?::\d{2})? ?(?:am|pm)|\d{1,2}:\d{2})\b")
+DURATION_PATTERN = re.compile(r"\b(\d+) ?(minutes?|mins?|m|hours?|hrs?|h)\b")
+# Fields each intent needs before the rules alone are trusted
+REQUIRED_FIELDS = {
+    "schedule": ("date", "time_range", "duration"),
+    "query": ("date",),
+    "cancel": ("date",),
+}
+
+def extract_rules(text):
+    """Rule-based parameter extraction: (params, confidence between 0 and 1)
+
+    params has the same keys as LLMService.extract_parameters; fields the
+    rules cannot see are None. Confidence is the share of the intent's
+    required fields that were found, or 0 without an intent.
+    """
+    text = normalize_utterance(text)
+    intent = next((name for name, pattern in INTENT_PATTERNS if pattern.search(text)), None)
+    # Only a date the parser resolves counts; the caller could not act on any other
+    date = next((match.group(0) for match in DATE_PATTERN.finditer(text) if parse_relative_date(match.group(0))), None)
+    time_range = TIME_PATTERN.search(text)
+    params = {
+        "intent": intent,
+        "summary": None,
+        "date": date,
+        "time_range": time_range.group(0) if time_range else None,
+        "duration": _duration(text),
+    }
+    if intent is None:
+        return params, 0.0
+    required = REQUIRED_FIELDS[intent]
+    found = sum(params[field] is not None for field in required)
+    if intent == "schedule":
+        found += 1  # two of a meeting's three details are enough; the conversation asks for the rest
+    return params, min(1.0, found / len(required))
+
+def _duration(text):
+    if "half an hour" in text:
+        return 30
+    if re.search(r"\ban hour\b", text):
+        return 60
+    match = DURATION_PATTERN.search(text)
+    if not match:
+        return None
+    value = int(match.group(1))
+    return value * 60 if match.group(2).startswith("h") else value
+
+class Speculation:
+    """An LLM extraction started ahead of time for one utterance
+
+    cancel() drops it: its dispatcher slot is freed at once and the streamed
+    request is closed at its next fragment. resolve() runs the rules and
+    either cancels the LLM or merges with it.
+    """
+    def __init__(self, nlu, text):
+        self.nlu = nlu
+        self.text = text
+        self.cancelled = threading.Event()
+        self.future = nlu.executor.submit(nlu.llm_service.try_extract_parameters, text, self.cancelled)
+
+    def cancel(self):
+        self._drop()
+        self.nlu._count("cancelled")
+
+    def _drop(self):
+        self.cancelled.set()
+        self.future.cancel()
+        self.nlu.llm_service.dispatcher.cancel(self.cancelled)
+
+    def resolve(self, threshold=None):
+        """Params for the utterance: the rules' if they are confident, else the rules merged over the LLM's
+
+        If neither names an intent (e.g. Ollama is down), the utterance is
+        treated as a date query, as LLMService.extract_parameters does.
+        """
+        params, confidence = extract_rules(self.text)
+        if confidence >= (self.nlu.threshold if threshold is None else threshold):
+            self._drop()
+            self.nlu._count("rules")
+            return params
+
+        llm_params = self.future.result()
+        if llm_params is None:
+            self.nlu._count("llm_failed")
+            if params["intent"] is None:
+                return dict(params, intent="query", date=params["date"] or self.text)
+            return params
+        self.nlu._count("merged")
+        # Regex matches are exact when they fire; the LLM fills in what they missed
+        merged = dict(llm_params)
+        merged.update({field: value for field, value in params.items() if value is not None})
+        return merged
+
+class SpeculativeNLU:
+    """Rule-based extraction racing an LLM extraction started at the same time
+
+    Easy utterances get rule-level latency (the LLM request is cancelled);
+    hard ones have had the LLM working since the utterance arrived.
+    """
+    def __init__(self, llm_service, threshold=NLU_CONFIDENCE_THRESHOLD, max_workers=NLU_MAX_WORKERS):
+        self.llm_service = llm_service
+        self.threshold = threshold
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.stats = {"rules": 0, "merged": 0, "llm_failed": 0, "cancelled": 0}
+        self.lock = threading.Lock()
+
+    def speculate(self, text):
+        """Start the LLM extraction now; call resolve() or cancel() on the result"""
+        return Speculation(self, text)
+
+    def parse(self, text):
+        return self.speculate(text).resolve()
+
+    def _count(self, name):
+        with self.lock:
+            self.stats[name] += 1
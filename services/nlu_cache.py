@@ -0,0 +1,128 @@
+# services/nlu_cache.py
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from dateutil.tz import gettz
+from config import CALENDAR_TIMEZONE, NLU_CACHE_SIZE, NLU_CACHE_TTL, NLU_CACHE_PATH
+from utils.time_utils import canonical_dates
+
+# Words that carry no scheduling meaning; removed before keying
+FILLERS = re.compile(
+    r"\b(?:um+|uh+|er+|hmm+|please|hey|hi|hello|just|actually|kindly|okay|ok|so|well|the|"
+    r"can you|could you|would you|i want to|i'd like to|i would like to|i need to)\b"
+)
+# Utterances that only make sense relative to today
+RELATIVE_DAYS = re.compile(
+    r"\b(?:today|tonight|tomorrow|yesterday|next|this|last|monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b"
+)
+
+def normalize_utterance(text):
+    """Canonical form of a command: lowercase, no punctuation or fillers, one spelling per date"""
+    text = text.lower().replace("what's", "what is").replace("'", "")
+    text = re.sub(r"[^\w\s:]", " ", text)  # keep ':' for times like 10:30
+    text = FILLERS.sub(" ", text)
+    return canonical_dates(" ".join(text.split()))
+
+def utterance_key(text, today=None):
+    """Cache key for an utterance; relative ones ("tomorrow", "friday") only match on the same calendar day"""
+    key = normalize_utterance(text)
+    if RELATIVE_DAYS.search(key):
+        # The calendar's day, not the host's: they differ when the two time zones straddle midnight
+        key += f"@{(today or datetime.now(gettz(CALENDAR_TIMEZONE)).date()).isoformat()}"
+    return key
+
+class UtteranceCache:
+    """LRU cache with a TTL for per-utterance LLM results
+
+    Holds at most max_size entries; the least recently used one is evicted
+    first and entries older than ttl seconds count as misses. With a path,
+    entries are saved as JSON after every put and reloaded on start, so the
+    cache survives restarts. cost is the LLM time an entry took to compute;
+    saved_seconds adds it up for every hit.
+    """
+    def __init__(self, max_size=NLU_CACHE_SIZE, ttl=NLU_CACHE_TTL, path=NLU_CACHE_PATH):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.entries = OrderedDict()  # key -> (stored_at epoch, cost seconds, value)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+        if path:
+            self._load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl:
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry[1]
+            return entry[2]
+
+    def put(self, key, value, cost=0.0):
+        with self.lock:
+            self.entries[key] = (time.time(), cost, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+            if self.path:
+                self._save()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            if self.path:
+                self._save()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'saved_seconds': round(self.saved_seconds, 3),
+        }
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"NLU cache load error: {str(e)}")
+            return
+        now = time.time()
+        for key, (stored_at, cost, value) in stored:
+            if now - stored_at <= self.ttl:
+                self.entries[key] = (stored_at, cost, value)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def _save(self):
+        # Write a temp file and swap it in, so a crash never leaves half a cache behind
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump([[key, list(entry)] for key, entry in self.entries.items()], f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"NLU cache save error: {str(e)}")
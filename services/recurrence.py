@@ -0,0 +1,124 @@
+# services/recurrence.py
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timezone
+from dateutil.rrule import rrulestr
+from dateutil.tz import gettz
+from services.event_store import CompactEvent, to_epoch
+
+def _parse_start(field, tz):
+    """Aware datetime for an API start/end field, in the event's own timezone (DST-correct expansion)"""
+    event_tz = gettz(field['timeZone']) if field.get('timeZone') else tz
+    if 'dateTime' in field:
+        return datetime.fromtimestamp(to_epoch(field['dateTime'], event_tz), event_tz)
+    # All-day: midnight of that date in the calendar timezone
+    return datetime.combine(datetime.strptime(field['date'], "%Y-%m-%d").date(), time(0, 0), tzinfo=tz)
+
+def _utc_stamp(value, dtstart):
+    """RFC 5545 date or local date-time (in dtstart's zone) as a UTC YYYYMMDDTHHMMSSZ stamp"""
+    if value.endswith('Z'):
+        return value
+    if 'T' in value:
+        local = datetime.strptime(value, "%Y%m%dT%H%M%S").replace(tzinfo=dtstart.tzinfo)
+    else:
+        local = datetime.combine(datetime.strptime(value, "%Y%m%d").date(), dtstart.timetz())
+    return local.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+def _normalize_recurrence(lines, dtstart):
+    """Rewrite Google recurrence lines into a form dateutil accepts for an aware DTSTART
+
+    dateutil wants UNTIL in UTC and does not understand TZID/VALUE parameters
+    on RDATE, so those values are converted to UTC stamps.
+    """
+    normalized = []
+    for line in lines:
+        name, _, value = line.partition(':')
+        kind = name.split(';')[0].upper()
+        if kind in ('RRULE', 'EXRULE'):
+            parts = []
+            for part in value.split(';'):
+                key, _, part_value = part.partition('=')
+                if key.upper() == 'UNTIL':
+                    part = f"UNTIL={_utc_stamp(part_value, dtstart)}"
+                parts.append(part)
+            normalized.append(f"{kind}:{';'.join(parts)}")
+        elif kind in ('RDATE', 'EXDATE'):
+            zone = dtstart
+            for param in name.split(';')[1:]:
+                key, _, param_value = param.partition('=')
+                if key.upper() == 'TZID':
+                    zone = dtstart.replace(tzinfo=gettz(param_value))
+            stamps = [_utc_stamp(v, zone) for v in value.split(',') if v]
+            normalized.append(f"{kind}:{','.join(stamps)}")
+    return normalized
+
+class RecurringSeries:
+    """A recurring master event expanded locally with dateutil.rrule
+
+    Instances are computed on demand and cached: the expanded range only
+    grows, so repeated and overlapping lookups cost a bisect. overrides holds
+    the original starts (epoch seconds) of moved or cancelled instances; those
+    are skipped here because exceptions are stored as ordinary events.
+    """
+    def __init__(self, id, summary, start, end, recurrence, tz):
+        self.id = id
+        self.summary = summary
+        self.tz = tz
+        self.dtstart = _parse_start(start, tz)
+        self.length = _parse_start(end, tz) - self.dtstart  # wall-clock length, like the API
+        self.all_day = 'date' in start
+        # An RRULE with neither COUNT nor UNTIL repeats forever
+        self.endless = any(
+            line.upper().startswith('RRULE') and 'COUNT=' not in line.upper() and 'UNTIL=' not in line.upper()
+            for line in recurrence
+        )
+        self.rule = rrulestr("\n".join(_normalize_recurrence(recurrence, self.dtstart)),
+                             dtstart=self.dtstart, forceset=True)
+        self.overrides = set()
+        self._covered = None  # (lo, hi) epoch range already expanded
+        self._starts = []
+        self._ends = []
+
+    @classmethod
+    def from_api(cls, event, tz):
+        return cls(event['id'], event.get('summary', ''), event['start'], event['end'], event['recurrence'], tz)
+
+    def instances(self, time_min, time_max):
+        """CompactEvent instances overlapping [time_min, time_max) in epoch seconds"""
+        span = self.length.total_seconds()
+        lo, hi = time_min - span, time_max
+        if self._covered is None or lo < self._covered[0] or hi > self._covered[1]:
+            if self._covered:
+                lo, hi = min(lo, self._covered[0]), max(hi, self._covered[1])
+            self._expand(lo, hi)
+
+        # Same overlap rule as the cache: zero-length instances count at their start
+        first = bisect_left(self._starts, time_min) if span == 0 else bisect_right(self._starts, time_min - span)
+        last = bisect_left(self._starts, time_max)
+        return [
+            CompactEvent(self.instance_id(start), self.summary, start, end)
+            for start, end in zip(self._starts[first:last], self._ends[first:last])
+            if start not in self.overrides
+        ]
+
+    def _expand(self, lo, hi):
+        after = datetime.fromtimestamp(lo, self.tz)
+        before = datetime.fromtimestamp(hi, self.tz)
+        occurrences = self.rule.between(after, before, inc=True)
+        self._starts = [occurrence.timestamp() for occurrence in occurrences]
+        self._ends = [(occurrence + self.length).timestamp() for occurrence in occurrences]
+        self._covered = (lo, hi)
+
+    def last_end(self):
+        """Epoch end of the final instance, or None if the series never ends"""
+        if self.endless:
+            return None
+        occurrences = list(self.rule)
+        return (occurrences[-1] + self.length).timestamp() if occurrences else self.dtstart.timestamp()
+
+    def instance_id(self, start):
+        # Same shape as Google's instance ids: <master id>_<original start (UTC, or local date if all-day)>
+        if self.all_day:
+            stamp = datetime.fromtimestamp(start, self.tz).strftime("%Y%m%d")
+        else:
+            stamp = datetime.fromtimestamp(start, timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        return f"{self.id}_{stamp}"
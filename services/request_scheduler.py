@@ -0,0 +1,236 @@
+# services/request_scheduler.py
+import random
+import threading
+import time
+from googleapiclient.errors import HttpError
+from config import API_RATE_LIMIT, API_BURST, API_MAX_RETRIES, API_BACKOFF_BASE, API_BACKOFF_MAX
+
+# 403s that are quota throttling rather than a permission problem
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+def is_rate_limited(error):
+    """True for Calendar quota responses: 429, or 403 with a rate-limit reason"""
+    if not isinstance(error, HttpError):
+        return False
+    status = error.resp.status
+    if status == 429:
+        return True
+    content = error.content.decode(errors='ignore') if isinstance(error.content, bytes) else str(error.content)
+    return status == 403 and any(reason in content for reason in RATE_LIMIT_REASONS)
+
+def is_retryable(error):
+    """Quota throttling and transient server errors are worth retrying; anything else is final"""
+    return is_rate_limited(error) or (isinstance(error, HttpError) and error.resp.status in RETRYABLE_STATUSES)
+
+def credential_of(request):
+    """Quota key for a googleapiclient request: the OAuth client and user behind its http
+
+    Requests without credentials (e.g. the fake backend) share one bucket.
+    """
+    return credential_key(getattr(getattr(request, 'http', None), 'credentials', None))
+
+def credential_key(creds):
+    """Bucket key for an OAuth credentials object (one per client and user)"""
+    if creds is None:
+        return 'default'
+    return (getattr(creds, 'client_id', None), getattr(creds, 'refresh_token', None) or id(creds))
+
+class TokenBucket:
+    """Token bucket refilled at rate tokens per second, holding at most capacity
+
+    reserve() never blocks: it takes the tokens (going into debt if needed)
+    and returns how long the caller must wait, so threads and coroutines can
+    share one bucket and are served in arrival order.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, cost=1):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= cost
+            return max(0.0, -self.tokens / self.rate)
+
+    def available(self):
+        with self.lock:
+            return min(self.capacity, self.tokens + (time.monotonic() - self.updated) * self.rate)
+
+class _Flight:
+    """One in-progress request that identical callers wait on"""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class RequestScheduler:
+    """Central gate for Calendar API calls
+
+    Every request passes a per-credential token bucket, so concurrent
+    sessions stay under the per-user quota instead of tripping it. Identical
+    read requests (same key) that are in flight at the same time are sent
+    once and share the response (single-flight). Rate-limit and transient
+    server errors are retried with full-jitter exponential backoff, honouring
+    Retry-After when Google sends one. metrics() reports queue depth and
+    throttling for capacity planning.
+
+    Writes that are not idempotent (e.g. events.insert) are only retried on
+    quota responses, which Google sends before doing any work: after a 5xx
+    or a lost response the event may already exist, and resending it would
+    double-book.
+    """
+    def __init__(self, rate=API_RATE_LIMIT, burst=API_BURST, max_retries=API_MAX_RETRIES,
+                 backoff_base=API_BACKOFF_BASE, backoff_max=API_BACKOFF_MAX):
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.buckets = {}  # credential key -> TokenBucket
+        self.flights = {}  # (credential key, request key) -> _Flight
+        self.lock = threading.Lock()
+        self.counters = {
+            'requests': 0,  # sent to Google, including retries
+            'queued': 0,  # callers currently waiting for a token
+            'peak_queued': 0,
+            'in_flight': 0,
+            'queue_wait': 0.0,  # total seconds spent waiting for tokens
+            'throttled': 0,  # 429 / rate-limit 403 responses
+            'retries': 0,
+            'failed': 0,  # gave up after max_retries, or a non-retryable error
+            'deduplicated': 0,  # callers served by another caller's identical request
+        }
+
+    def execute(self, request, key=None, cost=1, credential=None, idempotent=True):
+        """Run request.execute() under the rate limit, with retries
+
+        key marks an idempotent read: concurrent calls with the same key (and
+        credential) share one round trip. cost is the number of quota units
+        the call uses, e.g. the size of a batch. idempotent=False limits
+        retries to rate-limit responses.
+        """
+        credential = credential if credential is not None else credential_of(request)
+        if key is None:
+            return self._execute(request, cost, credential, idempotent)
+
+        flight_key = (credential, key)
+        with self.lock:
+            flight = self.flights.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[flight_key] = _Flight()
+            else:
+                self.counters['deduplicated'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._execute(request, cost, credential, idempotent)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[flight_key]
+            flight.done.set()
+
+    def _execute(self, request, cost, credential, idempotent):
+        attempt = 0
+        while True:
+            self.acquire(credential, cost)
+            self._count('in_flight', 1)
+            try:
+                return request.execute()
+            except Exception as e:
+                if not self.should_retry(e, attempt, idempotent):
+                    raise
+                error = e
+            finally:
+                self._count('in_flight', -1)
+            self.pause(attempt, error)
+            attempt += 1
+
+    def acquire(self, credential='default', cost=1):
+        """Block until the credential's bucket grants cost tokens"""
+        delay = self.reserve(credential, cost)
+        if delay:
+            try:
+                time.sleep(delay)
+            finally:
+                self._count('queued', -1)
+
+    def reserve(self, credential='default', cost=1):
+        """Take tokens and return the wait in seconds; a non-zero wait counts as queued until release()"""
+        if self.rate is None:  # unlimited, e.g. against the fake backend
+            self._count('requests', 1)
+            return 0.0
+        with self.lock:
+            bucket = self.buckets.get(credential)
+            if bucket is None:
+                bucket = self.buckets[credential] = TokenBucket(self.rate, self.burst)
+        delay = bucket.reserve(cost)
+        with self.lock:
+            self.counters['requests'] += 1
+            if delay:
+                self.counters['queued'] += 1
+                self.counters['peak_queued'] = max(self.counters['peak_queued'], self.counters['queued'])
+                self.counters['queue_wait'] += delay
+        return delay
+
+    def release(self):
+        """End a wait handed out by reserve() (for callers that sleep themselves, e.g. asyncio)"""
+        self._count('queued', -1)
+
+    def should_retry(self, error, attempt, idempotent=True):
+        """Record a failed call and say whether it is worth another attempt
+
+        Calls that are not idempotent are only retried when rate-limited,
+        since the request was then rejected before it took effect.
+        """
+        rate_limited = is_rate_limited(error)
+        if rate_limited:
+            self._count('throttled', 1)
+        retryable = is_retryable(error) if idempotent else rate_limited
+        if retryable and attempt < self.max_retries:
+            self._count('retries', 1)
+            return True
+        self._count('failed', 1)
+        return False
+
+    def backoff(self, attempt, error=None):
+        """Full-jitter exponential delay for a retry, at least Retry-After if the server asked for one"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        retry_after = getattr(getattr(error, 'resp', None), 'get', lambda *_: None)('retry-after')
+        if retry_after and str(retry_after).isdigit():
+            delay = max(delay, int(retry_after))
+        return delay
+
+    def pause(self, attempt, error=None):
+        """Sleep out the backoff delay before retry number attempt + 1"""
+        time.sleep(self.backoff(attempt, error))
+
+    def metrics(self):
+        """Snapshot of the counters, plus the buckets' current token levels"""
+        with self.lock:
+            snapshot = dict(self.counters)
+            snapshot['shared_requests'] = len(self.flights)  # single-flight requests open right now
+            buckets = list(self.buckets.values())
+        snapshot['tokens'] = [round(bucket.available(), 2) for bucket in buckets]
+        return snapshot
+
+    def _count(self, name, delta):
+        with self.lock:
+            self.counters[name] += delta
+
+SCHEDULER = RequestScheduler()
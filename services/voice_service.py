@@ -3,19 +3,40 @@ import os
 import json
 import queue
 import threading
-import tempfile
+import time
+import numpy as np
 import sounddevice as sd
-import soundfile as sf
 import win32com.client  # For Windows TTS
 import pyttsx3
+import vosk
 from vosk import Model, KaldiRecognizer
-from config import VOICE_SAMPLE_RATE, VOICE_CHANNELS, VOICE_SUBTYPE, VOSK_MODEL_NAME
+from config import VOICE_SAMPLE_RATE, VOICE_CHANNELS, VOSK_MODEL_NAME, VOSK_RECOGNIZER_POOL, VOSK_CHUNK_BYTES
+
+def _accept_waveform(recognizer, chunk):
+    """KaldiRecognizer.AcceptWaveform for a memoryview slice, without copying it into bytes
+
+    Uses vosk's cffi internals (as of the vosk==0.3.45 pinned in requirements.txt);
+    if a release lacks any of them, falls back to the public call on a copy.
+    """
+    # cffi only takes bytes for char*; from_buffer hands Vosk a pointer into the recording itself
+    ffi = getattr(vosk, "_ffi", None)
+    lib = getattr(vosk, "_c", None)
+    handle = getattr(recognizer, "_handle", None)
+    if ffi is None or handle is None or not hasattr(lib, "vosk_recognizer_accept_waveform"):
+        return recognizer.AcceptWaveform(bytes(chunk))
+    result = lib.vosk_recognizer_accept_waveform(handle, ffi.from_buffer(chunk), len(chunk))
+    if result < 0:
+        raise Exception("Failed to process waveform")
+    return result
 
 class VoiceInterface:
     def __init__(self):
         self.audio_queue = queue.Queue()
         self.is_listening = False
         self.vosk_model = None
+        # Idle recognizers, reset and ready for the next utterance (building one costs more than decoding a short command)
+        self.recognizers = queue.LifoQueue(maxsize=VOSK_RECOGNIZER_POOL)
+        self.stt_stats = {'utterances': 0, 'seconds': 0.0, 'recognizers_created': 0}
         self.speaker = win32com.client.Dispatch("SAPI.SpVoice")  # Windows TTS
     
     def _download_vosk_model(self):
@@ -98,32 +119,44 @@ class VoiceInterface:
                 if not self.vosk_model:
                     return ""
             
-            # Create a temporary WAV file
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_wav:
-                temp_path = temp_wav.name
-                sf.write(temp_path, audio_data, VOICE_SAMPLE_RATE, subtype=VOICE_SUBTYPE)
-            
-            # Use Vosk recognizer
-            recognizer = KaldiRecognizer(self.vosk_model, VOICE_SAMPLE_RATE)
-            recognizer.SetWords(False)
-            
-            result_text = ""
-            with open(temp_path, "rb") as audio_file:
-                while True:
-                    data = audio_file.read(4000)
-                    if len(data) == 0:
-                        break
-                    if recognizer.AcceptWaveform(data):
+            start = time.perf_counter()
+            # Raw int16 PCM straight from the recording (no copy when it already is contiguous int16)
+            pcm = memoryview(np.ascontiguousarray(audio_data, dtype=np.int16)).cast("B")
+            recognizer = self._take_recognizer()
+            try:
+                result_text = ""
+                # Slicing a memoryview does not copy; each chunk points into the recording
+                for offset in range(0, len(pcm), VOSK_CHUNK_BYTES):
+                    if _accept_waveform(recognizer, pcm[offset:offset + VOSK_CHUNK_BYTES]):
                         result = json.loads(recognizer.Result())
                         result_text += result.get("text", "") + " "
+                
+                # Get final result
+                final_result = json.loads(recognizer.FinalResult())
+                result_text += final_result.get("text", "")
+            finally:
+                self._return_recognizer(recognizer)
             
-            # Get final result
-            final_result = json.loads(recognizer.FinalResult())
-            result_text += final_result.get("text", "")
-            
-            # Clean up
-            os.remove(temp_path)
+            self.stt_stats['utterances'] += 1
+            self.stt_stats['seconds'] += time.perf_counter() - start
             return result_text.strip()
         except Exception as e:
             print(f"STT Error: {str(e)}")
-            return ""
\ No newline at end of file
+            return ""
+    
+    def _take_recognizer(self):
+        try:
+            return self.recognizers.get_nowait()
+        except queue.Empty:
+            recognizer = KaldiRecognizer(self.vosk_model, VOICE_SAMPLE_RATE)
+            recognizer.SetWords(False)
+            self.stt_stats['recognizers_created'] += 1
+            return recognizer
+    
+    def _return_recognizer(self, recognizer):
+        # Reset clears the decoder state but keeps the compiled graph, so the next utterance starts clean
+        try:
+            recognizer.Reset()
+            self.recognizers.put_nowait(recognizer)
+        except Exception:
+            pass  # pool is full (or the recognizer is broken): let it go
\ No newline at end of file
@@ -0,0 +1,25 @@
+# tests/conftest.py
+import os
+import sys
+
+# The project is a set of top-level modules, not a package; make them importable when running pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from gcal.auth import set_calendar_backend
+from gcal.fake_calendar import FakeCalendarService
+from services import calendar_service
+from services.calendar_sync import CalendarMirror
+
+@pytest.fixture(params=["mirror", "api"])
+def fake_calendar(request, monkeypatch):
+    """calendar_service served by a fresh FakeCalendarService, through the mirror and straight from the API"""
+    fake = FakeCalendarService()
+    set_calendar_backend(fake)
+    monkeypatch.setattr(calendar_service, "USE_EVENT_MIRROR", request.param == "mirror")
+    monkeypatch.setattr(calendar_service, "EVENT_MIRROR", CalendarMirror(":memory:") if request.param == "mirror" else None)
+    monkeypatch.setattr(calendar_service, "_schedule_reconcile", lambda: None)  # no background refresh timers
+    calendar_service.EVENT_CACHE.clear()
+    yield fake
+    calendar_service.EVENT_CACHE.clear()
+    set_calendar_backend(None)
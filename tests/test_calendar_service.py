@@ -0,0 +1,49 @@
+# tests/test_calendar_service.py
+from datetime import datetime, time, timedelta
+from dateutil.tz import gettz
+from config import CALENDAR_TIMEZONE, WORKING_HOURS
+from services import calendar_service
+
+TZ = gettz(CALENDAR_TIMEZONE)
+
+def _book_day(fake, days_out):
+    """Fill the working hours of the day days_out days from today; returns that date"""
+    day = datetime.now(TZ).date() + timedelta(days=days_out)
+    fake.add_event(datetime.combine(day, time(WORKING_HOURS[0]), tzinfo=TZ),
+                   datetime.combine(day, time(WORKING_HOURS[1]), tzinfo=TZ), "All day workshop")
+    return day
+
+def test_available_slots_on_a_booked_day_past_the_default_horizon(fake_calendar):
+    booked = _book_day(fake_calendar, 20)
+    assert calendar_service.find_available_slots(30, preferred_date=booked) == []
+    assert calendar_service.find_slots_in_windows(30, [(booked, None)]) == [[]]
+    # The day after is free, so the search itself still finds slots that far out
+    assert calendar_service.find_available_slots(30, preferred_date=booked + timedelta(days=1))
+
+def test_ranked_slots_on_a_far_date_respect_its_events(fake_calendar):
+    booked = _book_day(fake_calendar, 20)
+    # Leave one free hour at the end of a later day: the only slots offered are inside it
+    later = booked + timedelta(days=10)
+    fake_calendar.add_event(datetime.combine(later, time(WORKING_HOURS[0]), tzinfo=TZ),
+                            datetime.combine(later, time(WORKING_HOURS[1] - 1), tzinfo=TZ), "Offsite")
+
+    assert list(calendar_service.iter_available_slots(30, preferred_date=booked)) == []
+    assert calendar_service.find_best_slots(30, score="fragmentation", preferred_date=booked) == []
+    best = calendar_service.find_best_slots(30, k=5, preferred_date=later)
+    assert best and all(slot.hour == WORKING_HOURS[1] - 1 for slot in best)
+
+def test_common_slots_report_calendars_freebusy_could_not_read(fake_calendar):
+    day = datetime.now(TZ).date() + timedelta(days=2)
+    # The teammate is busy all morning; the second attendee's calendar does not exist
+    fake_calendar.add_event(datetime.combine(day, time(WORKING_HOURS[0]), tzinfo=TZ),
+                            datetime.combine(day, time(12), tzinfo=TZ), "Standup", calendar_id="team@example.com")
+    fake_calendar.add_event(datetime.combine(day, time(16), tzinfo=TZ), datetime.combine(day, time(17), tzinfo=TZ), "1:1")
+    slots, unreadable = calendar_service.find_common_slots(
+        ["primary", "team@example.com", "ghost@example.com"], 30, preferred_date=day)
+    assert unreadable == ["ghost@example.com"]
+    assert slots and all(slot.hour >= 12 and not 15.5 < slot.hour + slot.minute / 60 < 17 for slot in slots)
+
+    busy, errors = calendar_service.get_free_busy(["team@example.com", "ghost@example.com"],
+                                                  *calendar_service._slot_windows(1, day, None, TZ)[0])
+    assert list(busy) == ["team@example.com"]
+    assert errors["ghost@example.com"][0]["reason"] == "notFound"
@@ -0,0 +1,86 @@
+# tests/test_calendar_sync.py
+from datetime import datetime, time, timedelta
+from dateutil.tz import gettz
+from config import CALENDAR_TIMEZONE
+from gcal.fake_calendar import FakeCalendarService
+from services.calendar_sync import CalendarMirror
+from services.event_store import CompactEvent
+
+TZ = gettz(CALENDAR_TIMEZONE)
+# Near today: the fake, like Google, only expands recurring events a limited time ahead
+DAY = datetime.combine(datetime.now(TZ).date() + timedelta(days=2), time(9), tzinfo=TZ)
+RANGE = (DAY - timedelta(days=1), DAY + timedelta(days=14))
+
+def _mirrored(mirror):
+    events = mirror.store(RANGE[0].timestamp(), RANGE[1].timestamp()).events
+    return sorted((event.start, event.end) for event in events)
+
+def _server_expanded(fake):
+    """What Google returns for the range with singleEvents=True"""
+    page = fake.events().list(calendarId='primary', singleEvents=True, maxResults=2500,
+                              timeMin=RANGE[0].isoformat(), timeMax=RANGE[1].isoformat()).execute()
+    events = [CompactEvent.from_api(item, TZ) for item in page['items']]
+    return sorted((event.start, event.end) for event in events)
+
+def _daily_standup(fake, count=5):
+    return fake.add_event(DAY, DAY + timedelta(minutes=15), "Standup", recurrence=[f"RRULE:FREQ=DAILY;COUNT={count}"])
+
+def test_incremental_sync_pulls_only_changes():
+    fake = FakeCalendarService()
+    kept = fake.add_event(DAY, DAY + timedelta(hours=1), "Kept")
+    dropped = fake.add_event(DAY + timedelta(hours=2), DAY + timedelta(hours=3), "Dropped")
+    mirror = CalendarMirror(":memory:")
+    assert mirror.sync(fake) == 2
+    assert mirror.sync(fake) == 0
+
+    fake.add_event(DAY + timedelta(days=1), DAY + timedelta(days=1, hours=1), "Added")
+    fake.cancel_event(dropped['id'])
+    assert mirror.sync(fake) == 2
+    summaries = [event.summary for event in mirror.store(RANGE[0].timestamp(), RANGE[1].timestamp()).events]
+    assert sorted(summaries) == sorted([kept['summary'], "Added"])
+
+def test_expired_sync_token_triggers_a_full_resync():
+    fake = FakeCalendarService()
+    _daily_standup(fake)
+    fake.add_event(DAY + timedelta(hours=4), DAY + timedelta(hours=5), "Review")
+    mirror = CalendarMirror(":memory:", expand_recurrence=True)
+    mirror.sync(fake)
+    # Google forgets old tokens; the fake answers an unknown one with 410 Gone
+    with mirror.conn:
+        mirror.conn.execute("UPDATE sync_state SET sync_token = 'v999'")
+    fake.add_event(DAY + timedelta(days=2), DAY + timedelta(days=2, hours=1), "Later")
+    assert mirror.sync(fake) == 3
+    assert _mirrored(mirror) == _server_expanded(fake)
+
+def test_local_expansion_matches_the_server_with_exceptions():
+    fake = FakeCalendarService()
+    master = _daily_standup(fake)
+    mirror = CalendarMirror(":memory:", expand_recurrence=True)
+    mirror.sync(fake)
+    assert len(_mirrored(mirror)) == 5
+    assert _mirrored(mirror) == _server_expanded(fake)
+
+    # Move the second instance to the afternoon and cancel the fourth
+    moved = DAY + timedelta(days=1, hours=5)
+    fake.add_exception(master['id'], DAY + timedelta(days=1), moved, moved + timedelta(minutes=15))
+    fake.add_exception(master['id'], DAY + timedelta(days=3))
+    mirror.sync(fake)
+    starts = [datetime.fromtimestamp(start, TZ) for start, _ in _mirrored(mirror)]
+    assert moved in starts and DAY + timedelta(days=1) not in starts
+    assert DAY + timedelta(days=3) not in starts
+    assert _mirrored(mirror) == _server_expanded(fake)
+
+def test_cancelling_the_master_removes_the_series_and_its_exceptions():
+    fake = FakeCalendarService()
+    master = _daily_standup(fake)
+    moved = DAY + timedelta(days=1, hours=5)
+    fake.add_exception(master['id'], DAY + timedelta(days=1), moved, moved + timedelta(minutes=15))
+    other = fake.add_event(DAY + timedelta(hours=3), DAY + timedelta(hours=4), "Other")
+    mirror = CalendarMirror(":memory:", expand_recurrence=True)
+    mirror.sync(fake)
+    assert len(_mirrored(mirror)) == 6
+
+    fake.cancel_event(master['id'])
+    mirror.sync(fake)
+    events = mirror.store(RANGE[0].timestamp(), RANGE[1].timestamp()).events
+    assert [event.id for event in events] == [other['id']]
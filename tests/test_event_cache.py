@@ -0,0 +1,80 @@
+# tests/test_event_cache.py
+import pytest
+from services import event_cache
+from services.event_cache import RangeEventCache
+from services.event_store import CompactEvent
+
+HOUR = 3600
+
+def _event(event_id, start, end=None):
+    return CompactEvent(event_id, event_id, start * HOUR, (end if end is not None else start + 1) * HOUR)
+
+def _ids(store):
+    return [event.id for event in store]
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(event_cache.time, "time", lambda: now[0])
+    return now
+
+def test_only_uncovered_sub_ranges_are_fetched(clock):
+    cache = RangeEventCache(ttl=60)
+    fetched = []
+
+    def fetch(start, end):
+        fetched.append((start // HOUR, end // HOUR))
+        return [_event(f"e{start // HOUR}", start // HOUR)]
+
+    cache.get(0, 10 * HOUR, fetch)
+    cache.get(20 * HOUR, 30 * HOUR, fetch)
+    store = cache.get(5 * HOUR, 25 * HOUR, fetch)
+    assert fetched == [(0, 10), (20, 30), (10, 20)]
+    assert _ids(store) == ["e10", "e20"]
+    assert cache.missing(0, 30 * HOUR) == []
+    assert [seg[:2] for seg in cache.segments] == [[0, 10 * HOUR], [10 * HOUR, 20 * HOUR], [20 * HOUR, 30 * HOUR]]
+
+def test_refetch_replaces_the_range_and_keeps_neighbours(clock):
+    cache = RangeEventCache(ttl=60)
+    cache.add(0, 10 * HOUR, [_event("kept", 1), _event("deleted", 5)])
+    clock[0] += 30
+    cache.add(4 * HOUR, 6 * HOUR, [])  # the refetch no longer returns "deleted"
+    assert _ids(cache.store(0, 10 * HOUR)) == ["kept"]
+    assert [(seg[0] // HOUR, seg[1] // HOUR, seg[2]) for seg in cache.segments] == [
+        (0, 4, 1000.0), (4, 6, 1030.0), (6, 10, 1000.0)
+    ]
+
+def test_expired_ranges_are_fetched_again(clock):
+    cache = RangeEventCache(ttl=60)
+    cache.add(0, 10 * HOUR, [_event("old", 1)])
+    clock[0] += 30
+    cache.add(10 * HOUR, 20 * HOUR, [_event("new", 11)])
+    clock[0] += 45  # the first range is now 75 s old, the second 45 s
+    assert cache.missing(0, 20 * HOUR) == [(0, 10 * HOUR)]
+    assert _ids(cache.store(0, 20 * HOUR)) == ["new"]
+
+def test_oldest_ranges_are_evicted_past_max_events(clock):
+    cache = RangeEventCache(ttl=600, max_events=3)
+    cache.add(0, 10 * HOUR, [_event("a", 1), _event("b", 2)])
+    clock[0] += 1
+    cache.add(10 * HOUR, 20 * HOUR, [_event("c", 11), _event("d", 12)])
+    assert _ids(cache.store(0, 20 * HOUR)) == ["c", "d"]
+    assert cache.missing(0, 20 * HOUR) == [(0, 10 * HOUR)]
+
+def test_put_writes_through_to_covered_ranges_only(clock):
+    cache = RangeEventCache(ttl=60)
+    cache.add(0, 10 * HOUR, [])
+    cache.put([_event("booked", 3), _event("outside", 15)])
+    assert _ids(cache.store(0, 20 * HOUR)) == ["booked"]
+
+def test_store_is_reused_until_the_events_change(clock):
+    cache = RangeEventCache(ttl=60)
+    cache.add(0, 10 * HOUR, [_event("a", 1)])
+    first = cache.store(0, 10 * HOUR)
+    assert cache.get(0, 10 * HOUR, fetch=None) is first  # a hit builds nothing
+    cache.put([_event("b", 2)])
+    second = cache.store(0, 10 * HOUR)
+    assert second is not first and _ids(second) == ["a", "b"]
+    clock[0] += 61
+    cache.missing(0, 10 * HOUR)  # expiry drops the events
+    assert _ids(cache.store(0, 10 * HOUR)) == []
@@ -0,0 +1,113 @@
+# tests/test_fake_calendar.py
+from datetime import datetime, timedelta
+import pytest
+from dateutil.tz import gettz
+from googleapiclient.errors import HttpError
+from config import CALENDAR_TIMEZONE
+from gcal.fake_calendar import FakeCalendarService
+from services.calendar_sync import CalendarMirror
+
+TZ = gettz(CALENDAR_TIMEZONE)
+DAY = datetime(2030, 1, 7, 9, 0, tzinfo=TZ)
+
+def _list(fake, **params):
+    return fake.events().list(calendarId='primary', **params).execute()
+
+def _seed(fake, count):
+    return [fake.add_event(DAY + timedelta(hours=i), DAY + timedelta(hours=i, minutes=30), f"Meeting {i}")
+            for i in range(count)]
+
+def test_pagination_returns_every_event_once_in_start_order():
+    fake = FakeCalendarService()
+    seeded = _seed(fake, 7)
+    ids, page_token, pages = [], None, 0
+    while True:
+        page = _list(fake, maxResults=3, pageToken=page_token)
+        pages += 1
+        ids += [item['id'] for item in page['items']]
+        page_token = page.get('nextPageToken')
+        if not page_token:
+            break
+    assert pages == 3
+    assert ids == [event['id'] for event in seeded]
+    # Only the last page carries the sync token
+    assert 'nextSyncToken' in page
+
+def test_time_range_filters_overlapping_events():
+    fake = FakeCalendarService()
+    _seed(fake, 5)
+    page = _list(fake, timeMin=(DAY + timedelta(hours=1, minutes=15)).isoformat(),
+                 timeMax=(DAY + timedelta(hours=3)).isoformat())
+    assert [item['summary'] for item in page['items']] == ["Meeting 1", "Meeting 2"]
+
+def test_sync_token_returns_only_changes_with_tombstones():
+    fake = FakeCalendarService()
+    seeded = _seed(fake, 3)
+    token = _list(fake)['nextSyncToken']
+
+    assert _list(fake, syncToken=token)['items'] == []
+
+    added = fake.add_event(DAY + timedelta(days=1), DAY + timedelta(days=1, hours=1), "New")
+    fake.cancel_event(seeded[0]['id'])
+    delta = _list(fake, syncToken=token)
+    assert {item['id']: item['status'] for item in delta['items']} == {
+        added['id']: 'confirmed',
+        seeded[0]['id']: 'cancelled',
+    }
+    # A full list hides the tombstone
+    assert seeded[0]['id'] not in [item['id'] for item in _list(fake)['items']]
+    assert _list(fake, syncToken=delta['nextSyncToken'])['items'] == []
+
+def test_sync_token_cannot_be_combined_with_time_range():
+    fake = FakeCalendarService()
+    token = _list(fake)['nextSyncToken']
+    with pytest.raises(HttpError) as error:
+        _list(fake, syncToken=token, timeMin=DAY.isoformat())
+    assert error.value.resp.status == 400
+
+def test_unknown_sync_token_is_gone():
+    fake = FakeCalendarService()
+    _seed(fake, 2)
+    with pytest.raises(HttpError) as error:
+        _list(fake, syncToken="v999")
+    assert error.value.resp.status == 410
+
+def test_mirror_resyncs_from_scratch_after_410():
+    old = FakeCalendarService()
+    _seed(old, 5)
+    mirror = CalendarMirror(":memory:", expand_recurrence=False)
+    assert mirror.sync(old) == 5
+
+    # A fresh backend does not know the mirror's token, like Google after it expired
+    new = FakeCalendarService()
+    kept = new.add_event(DAY, DAY + timedelta(hours=1), "Only")
+    assert mirror.sync(new) == 1
+    events = mirror.store(DAY.timestamp(), (DAY + timedelta(days=1)).timestamp()).events
+    assert [event.summary for event in events] == [kept['summary']]
+
+def test_freebusy_merges_overlaps_and_clips_to_range():
+    fake = FakeCalendarService()
+    fake.add_event(DAY, DAY + timedelta(hours=1))
+    fake.add_event(DAY + timedelta(minutes=30), DAY + timedelta(hours=2))
+    fake.add_event(DAY + timedelta(hours=3), DAY + timedelta(hours=5))
+    cancelled = fake.add_event(DAY + timedelta(hours=6), DAY + timedelta(hours=7))
+    fake.cancel_event(cancelled['id'])
+
+    time_max = DAY + timedelta(hours=4)
+    result = fake.freebusy().query(body={
+        'timeMin': DAY.isoformat(), 'timeMax': time_max.isoformat(),
+        'items': [{'id': 'primary'}, {'id': 'nobody@example.com'}],
+    }).execute()
+    busy = [(datetime.fromisoformat(period['start'].replace('Z', '+00:00')),
+             datetime.fromisoformat(period['end'].replace('Z', '+00:00')))
+            for period in result['calendars']['primary']['busy']]
+    assert busy == [(DAY, DAY + timedelta(hours=2)), (DAY + timedelta(hours=3), time_max)]
+    assert result['calendars']['nobody@example.com']['errors'][0]['reason'] == 'notFound'
+
+def test_injected_errors_fail_the_next_requests_only():
+    fake = FakeCalendarService()
+    fake.inject_errors(1, status=429)
+    with pytest.raises(HttpError) as error:
+        _list(fake)
+    assert error.value.resp.status == 429
+    assert _list(fake)['items'] == []
@@ -0,0 +1,97 @@
+# tests/test_llm_dispatcher.py
+import json
+import threading
+import time
+from services.llm_dispatcher import LLMDispatcher
+from services.llm_service import LLMService
+from services.model_router import ModelRouter
+from services.nlu import SpeculativeNLU
+from services.nlu_cache import UtteranceCache
+
+EXTRACTED = {"intent": "schedule", "date": "tomorrow", "time_range": "afternoon", "duration": 30, "summary": None}
+
+class FakeOllama:
+    """Stands in for LLMService._stream: counts requests and streams a reply word by word"""
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.calls = []
+        self.finished = 0
+
+    def __call__(self, payload, timeout, stats=None):
+        self.calls.append(payload)
+        text = json.dumps(EXTRACTED) if payload.get("format") == "json" else "Sure. Tomorrow works, shall I book it?"
+        for word in text.split(" "):
+            time.sleep(self.delay)
+            yield word + " "
+        self.finished += 1
+        if stats is not None:
+            stats.update(done=True, load_duration=0)
+
+def _service(monkeypatch, ollama):
+    service = LLMService(warm_up=False, extraction_cache=UtteranceCache(path=None), router=ModelRouter(),
+                         dispatcher=LLMDispatcher(max_concurrency=2))
+    monkeypatch.setattr(service, "_stream", ollama)
+    return service
+
+def test_concurrent_speculations_of_one_utterance_share_a_request(monkeypatch):
+    ollama = FakeOllama()
+    nlu = SpeculativeNLU(_service(monkeypatch, ollama))
+    # "next week-ish" leaves the rules unsure, so both wait on the LLM
+    first = nlu.speculate("uh set something up sometime next week-ish")
+    second = nlu.speculate("uh set something up sometime next week-ish")
+    assert first.resolve(threshold=2) == second.resolve(threshold=2)
+    assert len(ollama.calls) == 1
+    assert nlu.llm_service.dispatcher.coalesced == 1
+
+def test_leader_cancelling_leaves_the_call_running_for_followers(monkeypatch):
+    ollama = FakeOllama()
+    nlu = SpeculativeNLU(_service(monkeypatch, ollama))
+    leader = nlu.speculate("book the usual thing")
+    time.sleep(0.05)  # the leader's request is in flight
+    follower = nlu.speculate("book the usual thing")
+    time.sleep(0.05)
+    leader.cancel()
+    assert follower.resolve(threshold=2)["intent"] == "schedule"
+    assert len(ollama.calls) == 1 and ollama.finished == 1
+    assert nlu.llm_service.dispatcher.active == 0
+
+def test_call_stops_once_every_caller_cancels(monkeypatch):
+    ollama = FakeOllama(delay=0.05)
+    service = _service(monkeypatch, ollama)
+    cancels = [threading.Event(), threading.Event()]
+    threads = [threading.Thread(target=service.try_extract_parameters, args=("book the usual thing", cancel))
+               for cancel in cancels]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    for cancel in cancels:
+        cancel.set()
+        service.dispatcher.cancel(cancel)
+    assert service.dispatcher.active == 0  # the slot is freed right away
+    for thread in threads:
+        thread.join()
+    assert len(ollama.calls) == 1 and ollama.finished == 0
+
+def test_identical_streamed_replies_share_one_stream(monkeypatch):
+    ollama = FakeOllama()
+    service = _service(monkeypatch, ollama)
+    state = {"stage": "CONFIRM", "selected_slot": "tomorrow 3 PM"}
+    replies = [None, None]
+
+    def listen(index, stop_after=None):
+        pieces = []
+        for piece in service.stream_conversation_response(state):
+            pieces.append(piece)
+            if len(pieces) == stop_after:
+                break
+        replies[index] = pieces
+
+    threads = [threading.Thread(target=listen, args=(0, 1)), threading.Thread(target=listen, args=(1,))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # The first listener stopping early did not cut the reply short for the other
+    assert replies[0] == ["Sure."]
+    assert replies[1] == ["Sure.", "Tomorrow works, shall I book it?"]
+    assert len(ollama.calls) == 1 and ollama.finished == 1
@@ -0,0 +1,48 @@
+# tests/test_llm_service.py
+import json
+import pytest
+from config import LLM_STATE_TOKEN_BUDGET
+from services.llm_service import compact_state, _estimate_tokens
+
+SLOTS = [f"2030-01-{day:02d} {hour:02d}:00:00+05:30" for day in range(7, 21) for hour in range(9, 18)]
+
+def conversation(**fields):
+    state = {
+        "stage": "SLOT_SELECTION",
+        "duration": 60,
+        "preferred_date": "2030-01-07",
+        "preferred_time_range": "afternoon",
+        "available_slots": SLOTS,
+        "offered_slots": SLOTS[:3],
+        "selected_slot": None,
+    }
+    state.update(fields)
+    return state
+
+@pytest.mark.parametrize("token_budget", [60, 80, LLM_STATE_TOKEN_BUDGET])
+def test_long_lists_are_halved_until_the_state_fits(token_budget):
+    text = compact_state(conversation(), token_budget)
+    assert _estimate_tokens(text) <= token_budget
+    state = json.loads(text)
+    # The small fields survive; the slot list keeps its earliest entries
+    assert state["stage"] == "SLOT_SELECTION"
+    assert state["duration"] == 60
+    assert state["preferred_date"] == "2030-01-07"
+    assert state["available_slots"] == SLOTS[:len(state["available_slots"])]
+    assert len(state["available_slots"]) < len(SLOTS)
+
+def test_largest_field_goes_once_lists_cannot_shrink():
+    text = compact_state(conversation(available_slots=SLOTS[:1], notes="x" * 600), token_budget=50)
+    assert _estimate_tokens(text) <= 50
+    state = json.loads(text)
+    assert "notes" not in state
+    assert state["stage"] == "SLOT_SELECTION" and state["duration"] == 60
+
+def test_state_under_budget_only_loses_empty_fields():
+    state = conversation(available_slots=SLOTS[:2], offered_slots=[], preferred_time_range="")
+    assert json.loads(compact_state(state)) == {
+        "stage": "SLOT_SELECTION", "duration": 60, "preferred_date": "2030-01-07", "available_slots": SLOTS[:2],
+    }
+
+def test_impossible_budget_leaves_an_empty_object():
+    assert compact_state(conversation(), token_budget=0) == "{}"
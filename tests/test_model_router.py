@@ -0,0 +1,65 @@
+# tests/test_model_router.py
+import pytest
+from services.model_router import ModelRouter, ModelStats
+
+def make_router(**kwargs):
+    return ModelRouter(routes={"extract": ["big", "small"]}, budgets={"extract": 1.0},
+                       window=20, min_validity=0.8, probe_interval=3600, log_size=50, **kwargs)
+
+def record(router, model, latencies, valid=True):
+    for latency in latencies:
+        router.finish(model, latency, valid)
+
+def test_p95_is_the_nearest_rank():
+    stats = ModelStats(window=20)
+    assert stats.p95() is None
+    stats.latencies.extend([0.1] * 9 + [2.0])
+    assert stats.p95() == 2.0  # rank ceil(9.5) = 10 is the slow call
+    stats.latencies.extend([0.1] * 10)
+    assert stats.p95() == 0.1  # rank 19 of 20
+
+def test_queued_calls_multiply_the_expected_latency():
+    router = make_router()
+    record(router, "big", [0.4] * 5)
+    # Nothing queued: 0.4s, then 0.8s with one call in flight
+    assert router.choose("extract") == "big"
+    assert router.choose("extract") == "big"
+    # Two in flight: 0.4 * 3 = 1.2s is over the 1s budget
+    assert router.choose("extract") == "small"
+    assert router.decisions[-1]['estimates']['big'] == pytest.approx(1.2)
+    router.finish("big", None)
+    assert router.choose("extract") == "big"
+
+def test_a_model_whose_output_fails_to_parse_is_skipped():
+    router = make_router()
+    record(router, "big", [0.1] * 4, valid=False)
+    assert router.choose("extract") == "big"  # under five samples, not judged yet
+    router.finish("big", 0.1, valid=False)
+    assert router.choose("extract") == "small"
+    assert "big validity 0%" in router.decisions[-1]['reason']
+
+def test_cancelled_calls_leave_no_sample():
+    router = make_router()
+    assert router.choose("extract") == "big"
+    router.finish("big", None)
+    assert router.report()['models']['big'] == {'p95': None, 'validity': None, 'samples': 0, 'in_flight': 0}
+
+def test_fastest_model_is_taken_when_nothing_fits():
+    router = make_router()
+    record(router, "big", [3.0] * 5)
+    record(router, "small", [1.5] * 5)
+    assert router.choose("extract") == "small"
+    assert router.decisions[-1]['reason'].startswith("over budget, fastest")
+
+def test_route_is_printed_only_when_it_changes(capsys):
+    router = make_router()
+    record(router, "big", [0.4] * 5)
+    capsys.readouterr()
+    for _ in range(4):
+        router.choose("extract")  # big, big, small, small
+    router.finish("big", None)
+    router.finish("big", None)
+    router.choose("extract")  # back to big
+    router.choose("extract")
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split(" (")[0] for line in lines] == ["↪ extract routed to small", "↪ extract routed to big"]
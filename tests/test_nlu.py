@@ -0,0 +1,28 @@
+# tests/test_nlu.py
+from datetime import datetime, timedelta
+import pytest
+from services import nlu
+from services.nlu import extract_rules
+from utils.time_utils import parse_relative_date
+
+TODAY = datetime.now().date()
+
+@pytest.mark.parametrize("phrase, expected", [
+    ("today", TODAY),
+    ("tonight", TODAY),
+    ("tomorrow", TODAY + timedelta(days=1)),
+    ("day after tomorrow", TODAY + timedelta(days=2)),
+    ("this monday", TODAY + timedelta(days=-TODAY.weekday() % 7)),
+    ("next monday", TODAY + timedelta(days=-TODAY.weekday() % 7 or 7)),
+])
+def test_rule_dates_resolve_to_a_day(phrase, expected):
+    params, confidence = extract_rules(f"what is on {phrase}")
+    assert params["date"] == phrase
+    assert confidence == 1.0
+    assert parse_relative_date(params["date"]) == expected
+
+def test_unresolvable_date_does_not_count(monkeypatch):
+    monkeypatch.setattr(nlu, "parse_relative_date", lambda date_str: None)
+    params, confidence = extract_rules("what is on tonight")
+    assert params["date"] is None
+    assert confidence == 0.0
@@ -0,0 +1,87 @@
+# tests/test_nlu_cache.py
+from datetime import date, datetime, timezone
+import pytest
+from services import nlu_cache
+from services.nlu_cache import UtteranceCache, normalize_utterance, utterance_key
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(nlu_cache.time, "time", lambda: now[0])
+    return now
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = UtteranceCache(max_size=2, ttl=60, path=None)
+    cache.put("a", {"intent": "query"})
+    cache.put("b", {"intent": "schedule"})
+    assert cache.get("a") == {"intent": "query"}  # "a" is now the most recent
+    cache.put("c", {"intent": "cancel"})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.evictions == 1
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = UtteranceCache(max_size=10, ttl=60, path=None)
+    cache.put("a", {"intent": "query"})
+    clock[0] += 60
+    assert cache.get("a") is not None
+    clock[0] += 1
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+def test_hits_add_up_the_llm_time_they_saved(clock):
+    cache = UtteranceCache(max_size=10, ttl=60, path=None)
+    cache.put("slow", {"intent": "query"}, cost=0.4)
+    cache.put("free", {"intent": "query"})
+    cache.get("slow")
+    cache.get("slow")
+    cache.get("free")
+    cache.get("unknown")
+    stats = cache.stats()
+    assert stats["saved_seconds"] == pytest.approx(0.8)
+    assert (stats["hits"], stats["misses"]) == (3, 1)
+
+def test_saved_entries_reload_without_the_expired_ones(clock, tmp_path):
+    path = str(tmp_path / "nlu_cache.json")
+    cache = UtteranceCache(max_size=10, ttl=60, path=path)
+    cache.put("old", {"intent": "query"}, cost=0.5)
+    clock[0] += 30
+    cache.put("new", {"intent": "schedule"}, cost=0.2)
+    clock[0] += 40
+    reloaded = UtteranceCache(max_size=10, ttl=60, path=path)
+    assert reloaded.get("old") is None
+    assert reloaded.get("new") == {"intent": "schedule"}
+
+def test_relative_utterances_are_keyed_by_day():
+    monday, tuesday = date(2030, 1, 7), date(2030, 1, 8)
+    assert utterance_key("What's on tomorrow?", monday) != utterance_key("What's on tomorrow?", tuesday)
+    assert utterance_key("what is on tomorrow", monday) == utterance_key("Um, what's on tomorrow", monday)
+    # Absolute dates mean the same thing any day
+    assert utterance_key("what is on 24 june", monday) == utterance_key("what is on 24 june", tuesday)
+
+def test_relative_key_uses_the_calendar_day_not_the_hosts(monkeypatch):
+    class Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            # 20:00 UTC is already the next day in the calendar's zone (Asia/Kolkata, UTC+5:30)
+            instant = datetime(2030, 1, 7, 20, 0, tzinfo=timezone.utc)
+            return instant.astimezone(tz) if tz else instant.replace(tzinfo=None)
+
+    monkeypatch.setattr(nlu_cache, "CALENDAR_TIMEZONE", "Asia/Kolkata")
+    monkeypatch.setattr(nlu_cache, "datetime", Clock)
+    assert utterance_key("what is on tomorrow").endswith("@2030-01-08")
+
+@pytest.mark.parametrize("spoken, canonical", [
+    ("twenty fourth of jun", "24 june"),
+    ("June 24th", "24 june"),
+    ("jun twenty fourth", "24 june"),
+    ("tmrw", "tomorrow"),
+    ("on fri", "on friday"),
+    ("sat at 10", "saturday at 10"),
+    ("the first option", "first option"),
+    ("2nd one", "2nd one"),
+    ("out in the sun", "out in sun"),
+    ("i sat 2 hours", "i sat 2 hours"),
+])
+def test_date_words_are_rewritten_only_in_date_context(spoken, canonical):
+    assert normalize_utterance(spoken) == canonical
@@ -0,0 +1,108 @@
+# tests/test_request_scheduler.py
+import threading
+import time
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+from services import request_scheduler
+from services.request_scheduler import RequestScheduler, TokenBucket
+
+def _error(status, reason="", retry_after=None):
+    headers = {"status": status}
+    if retry_after is not None:
+        headers["retry-after"] = str(retry_after)
+    return HttpError(httplib2.Response(headers), f'{{"error": {{"errors": [{{"reason": "{reason}"}}]}}}}'.encode())
+
+QUOTA = _error(429)
+RATE_LIMIT_403 = _error(403, "rateLimitExceeded")
+FORBIDDEN = _error(403, "forbidden")
+UNAVAILABLE = _error(503, "backendError")
+
+class FakeRequest:
+    """execute() raises the given errors in turn, then returns result"""
+    def __init__(self, *errors, result="ok", started=None, release=None):
+        self.errors = list(errors)
+        self.result = result
+        self.calls = 0
+        self.started = started
+        self.release = release
+
+    def execute(self):
+        self.calls += 1
+        if self.started is not None:
+            self.started.set()
+            self.release.wait(5)
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.result
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    scheduler = RequestScheduler(rate=None, max_retries=5)
+    pauses = []
+    monkeypatch.setattr(scheduler, "pause", lambda attempt, error=None: pauses.append(attempt))
+    scheduler.pauses = pauses
+    return scheduler
+
+def test_reads_retry_quota_and_server_errors(scheduler):
+    request = FakeRequest(QUOTA, RATE_LIMIT_403, UNAVAILABLE)
+    assert scheduler.execute(request) == "ok"
+    assert request.calls == 4
+    assert scheduler.pauses == [0, 1, 2]
+    assert scheduler.counters["throttled"] == 2 and scheduler.counters["retries"] == 3
+
+def test_inserts_retry_quota_errors_but_not_a_server_error(scheduler):
+    # A 503 may come after the event was created; resending it could double-book
+    request = FakeRequest(QUOTA, RATE_LIMIT_403, UNAVAILABLE)
+    with pytest.raises(HttpError) as error:
+        scheduler.execute(request, idempotent=False)
+    assert error.value is UNAVAILABLE
+    assert request.calls == 3
+    assert scheduler.counters["failed"] == 1
+
+def test_permission_403_is_never_retried(scheduler):
+    request = FakeRequest(FORBIDDEN)
+    with pytest.raises(HttpError):
+        scheduler.execute(request)
+    assert request.calls == 1 and scheduler.pauses == []
+
+def test_retries_stop_after_max_retries(scheduler):
+    scheduler.max_retries = 2
+    request = FakeRequest(QUOTA, QUOTA, QUOTA, QUOTA)
+    with pytest.raises(HttpError):
+        scheduler.execute(request)
+    assert request.calls == 3
+
+def test_backoff_is_jittered_and_honours_retry_after():
+    scheduler = RequestScheduler(backoff_base=0.5, backoff_max=4)
+    for attempt in range(6):
+        assert 0 <= scheduler.backoff(attempt) <= min(4, 0.5 * 2 ** attempt)
+    assert scheduler.backoff(0, _error(429, retry_after=7)) >= 7
+
+def test_token_bucket_paces_past_its_burst(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(request_scheduler.time, "monotonic", lambda: now[0])
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert [bucket.reserve() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.1)
+    assert bucket.reserve() == pytest.approx(0.2)  # waiters queue up in arrival order
+    now[0] += 1.0
+    assert bucket.available() == pytest.approx(2)  # refilled, capped at capacity
+    assert bucket.reserve(cost=5) == pytest.approx(0.3)
+
+def test_identical_reads_in_flight_share_one_round_trip(scheduler):
+    started, release = threading.Event(), threading.Event()
+    request = FakeRequest(started=started, release=release)
+    results = []
+    leader = threading.Thread(target=lambda: results.append(scheduler.execute(request, key="events")))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(scheduler.execute(FakeRequest(), key="events")))
+    follower.start()
+    while scheduler.counters["deduplicated"] == 0:
+        time.sleep(0.001)
+    release.set()
+    leader.join()
+    follower.join()
+    assert results == ["ok", "ok"]
+    assert request.calls == 1
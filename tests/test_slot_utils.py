@@ -0,0 +1,93 @@
+# tests/test_slot_utils.py
+import random
+from datetime import datetime, timedelta
+import pytest
+from utils.slot_utils import BusyIndex, bitmap_slot_starts, np
+
+MINUTE = 60
+STEP = 15 * MINUTE
+
+def per_slot_starts(intervals, window_start, window_end, duration, step):
+    """The original slot search: test every grid start against every busy interval"""
+    starts = []
+    current = window_start
+    while current + duration <= window_end:
+        if not any(current < end and current + duration > start for start, end in intervals):
+            starts.append(current)
+        current += step
+    return starts
+
+def random_busy(rng, window_start, window_end):
+    """Busy intervals on a 5-minute grid: touching, overlapping, zero-length and crossing the window edges"""
+    intervals = []
+    for _ in range(rng.randrange(0, 25)):
+        start = window_start + rng.randrange(-120, (window_end - window_start) // MINUTE + 120, 5) * MINUTE
+        length = rng.choice([0, 5, 10, 15, 30, 45, 60, 240]) * MINUTE
+        intervals.append((start, start + length))
+        if rng.random() < 0.3:
+            # Another meeting starting exactly when this one ends
+            intervals.append((start + length, start + length + rng.choice([5, 15, 30]) * MINUTE))
+    return intervals
+
+EDGE_CASES = {
+    "empty": [],
+    "touching": [(60 * MINUTE, 120 * MINUTE), (120 * MINUTE, 180 * MINUTE)],
+    "overlapping": [(60 * MINUTE, 150 * MINUTE), (90 * MINUTE, 120 * MINUTE), (140 * MINUTE, 200 * MINUTE)],
+    "crossing_start": [(-30 * MINUTE, 40 * MINUTE)],
+    "crossing_end": [(500 * MINUTE, 700 * MINUTE)],
+    "covers_window": [(-60 * MINUTE, 700 * MINUTE)],
+    "short_gap": [(0, 100 * MINUTE), (130 * MINUTE, 300 * MINUTE)],  # 30-minute gap, too short for an hour
+    "zero_length": [(100 * MINUTE, 100 * MINUTE), (307 * MINUTE, 307 * MINUTE)],
+    "off_grid": [(7 * MINUTE, 52 * MINUTE), (128 * MINUTE, 131 * MINUTE)],
+}
+WINDOW = (0, 600 * MINUTE)
+
+@pytest.mark.parametrize("name", sorted(EDGE_CASES))
+@pytest.mark.parametrize("duration", [15 * MINUTE, 30 * MINUTE, 60 * MINUTE, 135 * MINUTE])
+def test_sweep_matches_per_slot_loop_on_edge_cases(name, duration):
+    intervals = EDGE_CASES[name]
+    expected = per_slot_starts(intervals, *WINDOW, duration, STEP)
+    index = BusyIndex(intervals)
+    assert index.free_slot_starts(*WINDOW, duration, STEP) == expected
+    assert [slot.start for slot in index.iter_free_slots(*WINDOW, duration, STEP)] == expected
+
+@pytest.mark.skipif(np is None, reason="numpy is not installed")
+@pytest.mark.parametrize("name", sorted(EDGE_CASES))
+@pytest.mark.parametrize("duration", [15 * MINUTE, 30 * MINUTE, 60 * MINUTE, 135 * MINUTE])
+def test_bitmap_matches_per_slot_loop_on_edge_cases(name, duration):
+    intervals = EDGE_CASES[name]
+    expected = per_slot_starts(intervals, *WINDOW, duration, STEP)
+    assert bitmap_slot_starts([WINDOW], [BusyIndex(intervals)], duration, STEP) == expected
+
+@pytest.mark.parametrize("seed", range(200))
+def test_backends_match_per_slot_loop_on_random_calendars(seed):
+    rng = random.Random(seed)
+    # Several working-day windows, as the slot search builds them
+    day = 1440 * MINUTE
+    windows = [(d * day + 9 * 60 * MINUTE, d * day + rng.choice([12, 17, 18]) * 60 * MINUTE) for d in range(3)]
+    calendars = [random_busy(rng, windows[0][0], windows[-1][1]) for _ in range(rng.choice([1, 1, 2]))]
+    combined = [interval for intervals in calendars for interval in intervals]
+    duration = rng.choice([15, 20, 30, 45, 60, 135]) * MINUTE
+
+    expected = [start for window in windows for start in per_slot_starts(combined, *window, duration, STEP)]
+    index = BusyIndex(combined)
+    swept = [start for window in windows for start in index.free_slot_starts(*window, duration, STEP)]
+    assert swept == expected
+    lazy = [slot.start for window in windows for slot in index.iter_free_slots(*window, duration, STEP)]
+    assert lazy == expected
+    if np is not None:
+        assert bitmap_slot_starts(windows, [BusyIndex(intervals) for intervals in calendars], duration, STEP) == expected
+
+@pytest.mark.parametrize("limit", [0, 1, 3, 1000])
+def test_limit_stops_after_the_first_starts(limit):
+    intervals = EDGE_CASES["overlapping"] + EDGE_CASES["short_gap"]
+    full = BusyIndex(intervals).free_slot_starts(*WINDOW, 30 * MINUTE, STEP)
+    assert BusyIndex(intervals).free_slot_starts(*WINDOW, 30 * MINUTE, STEP, limit) == full[:limit]
+
+def test_sweep_works_on_datetimes():
+    origin = datetime(2030, 1, 7, 9, 0)
+    to_datetime = lambda seconds: origin + timedelta(seconds=seconds)
+    intervals = [(to_datetime(start), to_datetime(end)) for start, end in EDGE_CASES["overlapping"]]
+    window = (to_datetime(WINDOW[0]), to_datetime(WINDOW[1]))
+    expected = per_slot_starts(intervals, *window, timedelta(minutes=30), timedelta(minutes=15))
+    assert BusyIndex(intervals).free_slot_starts(*window, timedelta(minutes=30), timedelta(minutes=15)) == expected
@@ -0,0 +1,76 @@
+# tests/test_speech_utils.py
+import json
+import threading
+import pytest
+from config import LLM_STREAM_MIN_CLAUSE
+from utils.speech_utils import speech_chunks, speak_pipelined
+
+def ndjson_tokens(*fragments):
+    """Fragments as Ollama streams them: one JSON object per line, then a done line"""
+    lines = [json.dumps({"response": fragment, "done": False}) for fragment in fragments]
+    lines.append(json.dumps({"response": "", "done": True, "eval_count": len(fragments)}))
+    for line in lines:
+        chunk = json.loads(line)
+        if chunk["response"]:
+            yield chunk["response"]
+
+def test_sentences_split_even_when_fragments_straddle_them():
+    tokens = ndjson_tokens("I fo", "und a slot", ". It is at 3.", "30 tomorrow", "! Shall I bo", "ok it?")
+    assert list(speech_chunks(tokens)) == ["I found a slot.", "It is at 3.30 tomorrow!", "Shall I book it?"]
+
+def test_short_clauses_wait_for_the_minimum_length():
+    tokens = ndjson_tokens("Sure, ", "I can do that", ", and the meeting will be an hour long", ", starting at ten.")
+    pieces = list(speech_chunks(tokens, LLM_STREAM_MIN_CLAUSE))
+    assert pieces == ["Sure, I can do that, and the meeting will be an hour long,", "starting at ten."]
+    assert len(pieces[0]) >= LLM_STREAM_MIN_CLAUSE
+
+@pytest.mark.parametrize("min_clause_chars, expected", [
+    (5, ["Sure,", "I can do that,", "at ten."]),
+    (100, ["Sure, I can do that, at ten."]),
+])
+def test_clause_length_is_configurable(min_clause_chars, expected):
+    tokens = ndjson_tokens("Sure, I can ", "do that, at ten.")
+    assert list(speech_chunks(tokens, min_clause_chars)) == expected
+
+def test_trailing_fragment_is_flushed_when_the_stream_ends():
+    tokens = ndjson_tokens("Booked. ", "See you ", "then")
+    assert list(speech_chunks(tokens)) == ["Booked.", "See you then"]
+    assert list(speech_chunks(ndjson_tokens("  ", "\n"))) == []
+
+@pytest.mark.parametrize("text", [
+    "Your meeting with Dr. Rao is at noon.",
+    "Pick a day, e.g. Friday.",
+    "Mrs. Lee and Mr. Park are both free.",
+])
+def test_abbreviations_do_not_end_a_sentence(text):
+    tokens = ndjson_tokens(*[text[i:i + 3] for i in range(0, len(text), 3)])
+    assert list(speech_chunks(tokens)) == [text]
+
+def test_pipelined_speech_starts_before_generation_ends():
+    release = threading.Event()
+    spoken = []
+
+    def chunks():
+        yield "First."
+        # Generation stalls until the first piece has been spoken
+        assert release.wait(2)
+        yield "Second."
+
+    def speak(piece):
+        spoken.append(piece)
+        release.set()
+
+    first_audio = speak_pipelined(chunks(), speak)
+    assert spoken == ["First.", "Second."]
+    assert 0 <= first_audio < 1
+
+def test_pipelined_speech_survives_a_failing_stream(capsys):
+    def chunks():
+        yield "Partial answer."
+        raise ConnectionError("stream dropped")
+
+    spoken = []
+    assert speak_pipelined(chunks(), spoken.append) is not None
+    assert spoken == ["Partial answer."]
+    assert "Streaming error: stream dropped" in capsys.readouterr().out
+    assert speak_pipelined(iter([]), spoken.append) is None
@@ -0,0 +1,73 @@
+# utils/speech_utils.py
+import queue
+import re
+import threading
+import time
+
+# Sentence end: . ! ? followed by whitespace (so "3.30" or "e.g" mid-token do not split)
+SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s")
+# Clause break: , ; : followed by whitespace
+CLAUSE_END = re.compile(r"[,;:]\s")
+# Abbreviations whose full stop does not end a sentence ("Dr. Rao", "e.g. Friday")
+ABBREVIATION = re.compile(r"(?<![\w.])(?:mr|mrs|ms|dr|st|vs|e\.g|i\.e)$", re.IGNORECASE)
+
+def speech_chunks(tokens, min_clause_chars=40):
+    """Regroup a stream of generated text fragments into speakable pieces
+
+    A piece ends at a sentence boundary, or at a clause boundary once it is
+    at least min_clause_chars long (shorter clauses sound choppy when spoken
+    on their own). Whatever is left when the stream ends is the last piece.
+    """
+    buffer = ""
+    for token in tokens:
+        buffer += token
+        while True:
+            cut = _find_cut(buffer, min_clause_chars)
+            if cut is None:
+                break
+            piece, buffer = buffer[:cut].strip(), buffer[cut:]
+            if piece:
+                yield piece
+    if buffer.strip():
+        yield buffer.strip()
+
+def _find_cut(buffer, min_clause_chars):
+    for match in SENTENCE_END.finditer(buffer):
+        if not (match.group().startswith(".") and ABBREVIATION.search(buffer, 0, match.start())):
+            return match.end()
+    for match in CLAUSE_END.finditer(buffer):
+        if match.end() >= min_clause_chars:
+            return match.end()
+    return None
+
+def speak_pipelined(chunks, speak):
+    """Speak chunks as they arrive while the producer keeps generating
+
+    chunks is consumed on a background thread and handed over through a
+    queue; speak runs on the calling thread (TTS engines such as pyttsx3 are
+    tied to the thread that created them). Returns the seconds until the
+    first chunk was ready to speak, or None if there was nothing to say.
+    """
+    pieces = queue.Queue()
+    done = object()
+    start = time.perf_counter()
+
+    def produce():
+        try:
+            for chunk in chunks:
+                pieces.put(chunk)
+        except Exception as e:
+            print(f"Streaming error: {str(e)}")
+        finally:
+            pieces.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    first_audio = None
+    while True:
+        piece = pieces.get()
+        if piece is done:
+            return first_audio
+        if first_audio is None:
+            first_audio = time.perf_counter() - start
+        speak(piece)
@@ -1,6 +1,8 @@
 # utils/time_utils.py
 from datetime import datetime, timedelta
 from dateutil import parser as date_parser
+from dateutil.tz import gettz
+from config import CALENDAR_TIMEZONE
 import re
 
 # Mapping of ordinal words to numbers
@@ -21,6 +23,67 @@ MONTH_MAP = {
     'july': 7, 'august': 8, 'september': 9, 'october': 10, 'november': 11, 'december': 12
 }
 
+# Spoken / typed shorthand for the same day names
+DAY_ALIASES = {
+    'tmrw': 'tomorrow', 'tmr': 'tomorrow', 'tomorow': 'tomorrow', '2morrow': 'tomorrow', 'tonite': 'tonight',
+    'tues': 'tuesday', 'thur': 'thursday', 'thurs': 'thursday', 'sept': 'september'
+}
+# Shorthand that is also an ordinary word ("sun", "sat", "mar"); only rewritten next to other date words
+DATE_CONTEXT_ALIASES = {
+    'mon': 'monday', 'tue': 'tuesday', 'wed': 'wednesday', 'thu': 'thursday', 'fri': 'friday',
+    'sat': 'saturday', 'sun': 'sunday',
+    'jan': 'january', 'feb': 'february', 'mar': 'march', 'apr': 'april', 'jun': 'june', 'jul': 'july',
+    'aug': 'august', 'sep': 'september', 'oct': 'october', 'nov': 'november', 'dec': 'december'
+}
+# Words that put the next one in date context ("on sat", "next fri")
+DATE_PREPOSITIONS = {'on', 'next', 'this', 'last', 'by', 'until', 'till', 'before', 'after', 'every'}
+TIMES_OF_DAY = {'morning', 'afternoon', 'evening', 'night'}
+ORDINAL_WORDS = {part for ordinal in ORDINAL_MAP for part in ordinal.split()}
+
+def canonical_dates(text):
+    """Rewrite the date words in lowercase text into one spelling
+
+    "twenty fourth of jun", "june 24th" and "24 june" all become "24 june";
+    "tmrw" becomes "tomorrow" and "on fri" becomes "on friday". Ambiguous
+    shorthand and ordinals are only rewritten in date context, so "first
+    option" and "out in the sun" keep their words.
+    """
+    words = text.split()
+    for i, word in enumerate(words):
+        if word in DAY_ALIASES:
+            words[i] = DAY_ALIASES[word]
+        elif word in DATE_CONTEXT_ALIASES and _in_date_context(words, i):
+            words[i] = DATE_CONTEXT_ALIASES[word]
+    text = " ".join(words)
+    months = "|".join(MONTH_MAP)
+    # Longest ordinals first so "twenty fourth" wins over "fourth"; only next to a month
+    ordinals = "|".join(sorted(ORDINAL_MAP, key=len, reverse=True))
+    day = rf"(?:{ordinals}|\d{{1,2}}(?:st|nd|rd|th))"
+    text = re.sub(rf"\b{day}\b(?= (?:of )?(?:{months})\b)", lambda m: _day_number(m.group(0)), text)
+    text = re.sub(rf"\b({months}) ({day})\b", lambda m: f"{m.group(1)} {_day_number(m.group(2))}", text)
+    text = re.sub(rf"\b(\d{{1,2}}) of ({months})\b", r"\1 \2", text)
+    text = re.sub(rf"\b({months}) (\d{{1,2}})\b(?!:)", r"\2 \1", text)
+    return text
+
+def _in_date_context(words, i):
+    """Whether words[i] sits next to a date word: "on sat", "fri morning", "24 jun", "24th of jun"""
+    before = words[i - 1] if i > 0 else ""
+    after = words[i + 1] if i + 1 < len(words) else ""
+    if before in DATE_PREPOSITIONS:
+        return True
+    if DATE_CONTEXT_ALIASES[words[i]] not in MONTH_MAP:
+        return after in TIMES_OF_DAY or after == "at"  # "fri morning", "sat at 10"
+    if before == "of" and i > 1:
+        before = words[i - 2]
+    return _is_day_number(before) or _is_day_number(after)
+
+def _is_day_number(word):
+    return word in ORDINAL_WORDS or re.fullmatch(r"\d{1,2}(?:st|nd|rd|th)?", word) is not None
+
+def _day_number(ordinal):
+    """"twenty fourth" or "24th" -> "24"""
+    return str(ORDINAL_MAP[ordinal]) if ordinal in ORDINAL_MAP else ordinal[:-2]
+
 def parse_relative_date(date_str):
     """Parse relative date expressions including 'twenty fourth june' format"""
     if not date_str:
@@ -32,9 +95,11 @@ def parse_relative_date(date_str):
     current_year = today.year
     
     # Handle special cases first
-    if date_str == "tomorrow":
+    if date_str == "day after tomorrow":
+        return today + timedelta(days=2)
+    elif date_str == "tomorrow":
         return today + timedelta(days=1)
-    elif date_str == "today":
+    elif date_str in ("today", "tonight"):
         return today
     elif date_str == "yesterday":
         return today - timedelta(days=1)
@@ -56,6 +121,9 @@ def parse_relative_date(date_str):
             if days_ahead == 0:  # Today is the day, so next week
                 days_ahead = 7
             return today + timedelta(days=days_ahead)
+        if f"this {day}" in date_str:
+            # The coming one; today if it is that day
+            return today + timedelta(days=(i - today.weekday()) % 7)
     
     # Handle "twenty fourth june" format
     for ordinal, number in ORDINAL_MAP.items():
@@ -99,7 +167,10 @@ def parse_relative_date(date_str):
         return None
 
 def parse_time_constraint(constraint, existing_events, current_date=None, current_time_range=None):
-    """Parse complex time constraints with better event name extraction"""
+    """Parse complex time constraints with better event name extraction
+
+    existing_events is an iterable of pre-parsed CompactEvent records (e.g. an EventStore).
+    """
     if not constraint:
         return current_date, current_time_range
         
@@ -119,7 +190,7 @@ def parse_time_constraint(constraint, existing_events, current_date=None, curren
             best_score = 0
             
             for ev in existing_events:
-                summary = ev['summary'].lower()
+                summary = ev.summary.lower()
                 # Simple similarity check - could be improved
                 similarity = len(set(event_name.split()) & set(summary.split()))
                 if similarity > best_score:
@@ -127,8 +198,9 @@ def parse_time_constraint(constraint, existing_events, current_date=None, curren
                     best_score = similarity
             
             if best_match:
-                ref_start = date_parser.parse(best_match['start'].get('dateTime', best_match['start'].get('date')))
-                ref_end = date_parser.parse(best_match['end'].get('dateTime', best_match['end'].get('date')))
+                tz = gettz(CALENDAR_TIMEZONE)
+                ref_start = best_match.start_datetime(tz)
+                ref_end = best_match.end_datetime(tz)
                 
                 if relation == "before":
                     current_date = ref_start.date()